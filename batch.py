@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Create many reports - e.g. for many users, or in many styles - from one
+    process, as listed in a job manifest.
+Notes:
+    The manifest is a JSON file holding a list of jobs (or a dict with a
+    "jobs" list); each job is a dict of report.py options, using their long
+    names, for example:
+
+    {"jobs": [
+        {"user": "shurelock", "style": "summary", "file": "shurelock.pdf"},
+        {"games": [421, 986], "style": "excel", "file": "picks.xls",
+         "zone": "US"}
+    ]}
+
+    Options given on the command line are the defaults for every job.  The
+    game & image caches, the BGG client (and its rate limiter) and fonts are
+    shared by all the jobs, so a game is only retrieved from BGG once, even
+    if it appears in many users' collections.
+"""
+import json
+import sys
+import time
+from report import create_parser, main, profiled, shared_resources
+
+# options used once for the whole batch (e.g. to create the shared caches),
+# which cannot be changed by a job
+BATCH_OPTIONS = ('cache_dir', 'cache_ttl', 'profile', 'profile_file')
+
+
+def load_jobs(filename):
+    """Return the list of jobs (dicts) in a manifest file."""
+    with open(filename) as manifest:
+        jobs = json.load(manifest)
+    if isinstance(jobs, dict):
+        jobs = jobs.get('jobs', [])
+    if not isinstance(jobs, list) or \
+            not all(isinstance(job, dict) for job in jobs):
+        raise ValueError('A manifest must hold a list of jobs')
+    return jobs
+
+
+def job_options(defaults, job):
+    """Return a copy of the default options, updated from a job."""
+    conf = type(defaults)(**vars(defaults))
+    for key, value in job.items():
+        name = key.lstrip('-').replace('-', '_')
+        if name == 'manifest' or not hasattr(conf, name):
+            raise ValueError('"%s" is not a report option' % key)
+        if name in BATCH_OPTIONS:
+            raise ValueError('"%s" can only be set for the whole batch' % key)
+        if name == 'games' and not isinstance(value, list):
+            value = [value]
+        if name == 'where' and not isinstance(value, list):
+            value = value.split()
+        setattr(conf, name, value)
+    return conf
+
+
+def run_batch(conf):
+    """Run all jobs in a manifest; return the no. that failed."""
+    try:
+        jobs = load_jobs(conf.manifest)
+    except (IOError, ValueError) as err:
+        print 'Unable to read the manifest %s: %s' % (conf.manifest, err)
+        return 1
+    shared = shared_resources(conf)
+    failed = 0
+    start = time.time()
+    for number, job in enumerate(jobs):
+        print 'Job %d of %d: %s' % (number + 1, len(jobs), json.dumps(job))
+        try:
+            created = main(job_options(conf, job), shared=shared)
+        except ValueError as err:
+            print err
+            created = False
+        except SystemExit:  # main() exits on bad options
+            created = False
+        except Exception as err:  # e.g. BGG cannot be reached
+            print 'Error: %s' % err
+            created = False
+        if not created:
+            failed += 1
+            print 'Job %d failed' % (number + 1)
+    print 'Completed %d of %d jobs in %.1f seconds' % (
+        len(jobs) - failed, len(jobs), time.time() - start)
+    if conf.progress:
+        print shared['cache'].stats()
+        print shared['image_cache'].stats()
+    return failed
+
+
+if __name__ == "__main__":
+    parser = create_parser()
+    parser.description = 'Create reports for all the jobs in a manifest'
+    parser.add_argument('manifest',
+                        help='Name of a JSON file listing the jobs to run')
+    conf = parser.parse_args()
+    sys.exit(1 if profiled(conf, run_batch, conf) else 0)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Benchmark of converting game descriptions from BGG markup to reportlab
+    Paragraph markup: the single-pass converter (`markup.bgg_to_html`)
+    versus the chained str.replace calls used before ("before").
+Notes:
+    There are two corpora, made from the dummy games' descriptions: "plain"
+    (as BGG usually sends them) and "markup", with BGG tags, entities, line
+    breaks and a few stray brackets added at random.  Also counts the
+    descriptions whose converted markup a Paragraph cannot parse.
+    Run from any directory:
+
+        python benchmarks/descriptions.py [descriptions]
+"""
+# lib
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph
+from dummy.game import get_games
+from markup import bgg_to_html
+
+SHORT = 500
+EXTRAS = (
+    ('[b]', '[/b]'), ('[i]', '[/i]'), ('[thing=421]', '[/thing]'),
+    ('[url=https://boardgamegeek.com]', '[/url]'), ('&quot;', '&quot;'),
+    ('\n\n', ''), ('[', ''), ('Q&A ', ''), ('[-]', '[/-]'),
+)
+
+
+def make_corpus(count, markup=True, seed=1):
+    """Return a list of descriptions; with BGG markup added, if `markup`."""
+    rand = random.Random(seed)
+    texts = [game._description for game in get_games()]
+    corpus = []
+    for number in range(count):
+        words = rand.choice(texts).split(' ')
+        for _ in range(rand.randint(0, 12) if markup else 0):
+            start, end = rand.choice(EXTRAS)
+            pos = rand.randint(0, len(words) - 1)
+            words[pos] = start + words[pos] + end
+        corpus.append(u' '.join(words))
+    return corpus
+
+
+def before(text, short=SHORT):
+    """Description and short description, as converted before."""
+    html = (text or '').replace('[', '<').replace(']', '>').\
+        replace('\n', '<br/>')
+    desc = text[0:short]
+    _cut = int(
+        (len(desc) -
+         len(desc.replace(',', '').replace('.', '').replace(':', '')))
+        / 2 + short)
+    return html, text[0:_cut][0:-3] + '...'
+
+
+def failures(convert, corpus):
+    """Return the no. of descriptions whose markup cannot be parsed."""
+    style = getSampleStyleSheet()['Normal']
+    failed = 0
+    for text in corpus:
+        try:
+            Paragraph(convert(text)[0], style)
+        except ValueError:
+            failed += 1
+    return failed
+
+
+def main(count=2000):
+    print '%d descriptions per corpus' % count
+    print '%-8s %-8s %14s %10s' % (
+        'corpus', 'method', 'per text (us)', 'failures')
+    for kind in ('plain', 'markup'):
+        corpus = make_corpus(count, markup=kind == 'markup')
+        for name, convert in (
+                ('before', before),
+                ('after', lambda text: bgg_to_html(text, SHORT))):
+            def run():
+                for text in corpus:
+                    convert(text)
+            seconds = min(timeit.repeat(run, number=1, repeat=3))
+            print '%-8s %-8s %14.1f %10d' % (
+                kind, name, seconds / count * 1e6,
+                failures(convert, corpus))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
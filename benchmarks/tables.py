@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Micro-benchmark of the cost of creating the per-game tables of a PDF
+    report: the code used before table layouts were compiled once per style
+    ("before") versus GameReportBuilder's current code ("after").
+Notes:
+    The "before" functions are copies of the GameReportBuilder methods as
+    they were before layouts.py was added: each game's table builds its own
+    column widths and TableStyle (and, for the summary, its own table and
+    header row), and each image's size is read from its file every time.
+    Both create the same cells, from the same games.
+
+    The summary style is now one table for all the games, so it is timed as
+    a whole - created and wrapped, which creates its rows - against one
+    wrapped table per game, as before; both are divided by the number of
+    games.
+
+    Uses the dummy games, so no access to boardgamegeek.com is needed.  Run
+    from any directory:
+
+        python benchmarks/tables.py [rounds]
+"""
+# lib
+import os
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # dummy games have image paths relative to here
+
+# reportlab
+from reportlab.lib.colors import black
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Paragraph, Table, TableStyle, Image
+# local
+from dummy.game import get_games
+from images import ImageCache
+from report_builder import GameReportBuilder
+
+MAX_HEIGHT = 1e9  # points; room for every row of a summary table
+
+
+def before_image(builder, game, path, width=1*cm, height=None):
+    """GameReportBuilder.get_image(), as it was before."""
+    path = builder.image_paths.get(path) or builder.image_cache.get(path)
+    img = ImageReader(path)
+    iw, ih = img.getSize()
+    aspect = ih / float(iw)
+    if height:
+        width = height * aspect
+    else:
+        height = width * aspect
+    return Image(path, width=width, height=height)
+
+
+def before_summary(builder, game, num):
+    """GameReportBuilder.create_table_summary(), as it was before."""
+    div = builder.doc.width / 7.0
+    table_data = [
+        [
+            Paragraph('<b>%s</b>' % game.name, builder.styles['left']),
+            Paragraph('<b>%s (%s)</b>' %
+                      (game.averageweight, game.percentageweight),
+                      builder.styles['left']),
+            Paragraph('<b>%s</b>' % game.yearpublished,
+                      builder.styles['left']),
+            Paragraph('<b>%s</b>' % game.age, builder.styles['left']),
+            Paragraph('<b>%s</b>' % game.playingtime, builder.styles['left']),
+            Paragraph('<b>%s</b>' % game.players, builder.styles['left']),
+        ]
+    ]
+    if num == 0:
+        table_data.insert(0, [
+            Paragraph('<b>Name</b>', builder.styles['info']),
+            Paragraph('<b>Weight (%)</b>', builder.styles['left']),
+            Paragraph('<b>Year</b>', builder.styles['left']),
+            Paragraph('<b>Age</b>', builder.styles['left']),
+            Paragraph('<b>Time</b>', builder.styles['left']),
+            Paragraph('<b>Players</b>', builder.styles['left']),
+        ])
+    game_table = Table(table_data,
+                       colWidths=[div*2, div, div, div, div, div])
+    game_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 0.5, black),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    return game_table
+
+
+def before_compact(builder, game):
+    """GameReportBuilder.create_table_compact(), as it was before."""
+    div = builder.doc.width / 7.0
+    HT = 0.6 * cm
+    _image = builder.get_image_path(game, '_sq')
+    game_image = before_image(builder, game, path=_image, height=HT*3 - 8)
+    table_data = [
+        [
+            game_image,
+            Paragraph('<b>%s</b>' % game.name, builder.styles['info']),
+            '', '',
+            Paragraph('<b>%s</b>' % game.age, builder.styles['centre']),
+            Paragraph('<b>%s</b> min' % game.playingtime,
+                      builder.styles['centre']),
+            Paragraph('<b>%s</b> players' % game.players,
+                      builder.styles['right'])
+        ],
+        [
+            '', Paragraph('%s' % game.mechanics, builder.styles['left']),
+            '', '', '', '', ''
+        ],
+        [
+            '', Paragraph('%s' % game.categories, builder.styles['left']),
+            '', '', '', '', ''
+        ]
+    ]
+    game_table = Table(table_data,
+                       colWidths=[div, div, div, div, div, div, div],
+                       rowHeights=[HT] * len(table_data))
+    game_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 0.5, black),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('SPAN', (0, 0), (0, 2)),
+        ('SPAN', (1, 0), (3, 0)),
+        ('SPAN', (1, 1), (6, 1)),
+        ('SPAN', (1, 2), (6, 2)),
+    ]))
+    return game_table
+
+
+def before_full(builder, game):
+    """GameReportBuilder.create_table(), as it was before."""
+    div = builder.doc.width / 8.0
+    _image = builder.get_image_path(game, '_md')
+    game_image = before_image(builder, game, path=_image, width=div * 3 - 9)
+    info = builder.styles['info']
+    table_data = [
+        [
+            Paragraph('<b>Ages</b>: %s' % game.age, info),
+            '',
+            Paragraph('<b>Published</b>: %s' % game.yearpublished, info),
+            '',
+            Paragraph('<b>Time</b>: %s min' % game.playingtime, info),
+            '',
+            Paragraph('<b>Players</b>: %s' % game.players, info),
+            ''
+        ],
+        [
+            Paragraph('<b>Categories</b>: %s' % game.categories, info),
+            '', '', '', '', '', '', ''
+        ],
+        [
+            Paragraph('<b>Mechanics</b>: %s' % game.mechanics, info),
+            '', '', '', '', '', '', ''
+        ],
+        [
+            Paragraph(game.description_html, builder.styles['left']),
+            '', '', '', '',
+            game_image,
+            '', ''
+        ]
+    ]
+    game_table = Table(table_data,
+                       colWidths=[div, div, div, div, div, div, div, div])
+    game_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 0.5, black),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('SPAN', (0, 0), (1, 0)),
+        ('SPAN', (2, 0), (3, 0)),
+        ('SPAN', (4, 0), (5, 0)),
+        ('SPAN', (6, 0), (7, 0)),
+        ('SPAN', (0, 1), (7, 1)),
+        ('SPAN', (0, 2), (7, 2)),
+        ('SPAN', (0, 3), (4, 3)),
+        ('SPAN', (5, 3), (7, 3)),
+    ]))
+    return game_table
+
+
+def make_tables(builder, style, games, before):
+    """Create the tables for games, with the code used before, or now."""
+    if style == 'summary':
+        if before:
+            for num, game in enumerate(games):
+                table = before_summary(builder, game, num)
+                table.wrap(builder.doc.width, MAX_HEIGHT)
+        else:
+            table = builder.create_table_summary(games)
+            table.wrap(builder.doc.width, MAX_HEIGHT)  # creates all the rows
+        return
+    for game in games:
+        if style == 'full':
+            if before:
+                before_full(builder, game)
+            else:
+                builder.create_table(game)
+        elif before:
+            before_compact(builder, game)
+        else:
+            builder.create_table_compact(game)
+
+
+def main(rounds=200):
+    tmp_dir = tempfile.mkdtemp()
+    games = get_games()
+    builder = GameReportBuilder(
+        games=games, filename=os.path.join(tmp_dir, 'bench.pdf'),
+        image_cache=ImageCache(tmp_dir), image_dpi=None)
+    print '%-8s %12s %12s %8s' % ('style', 'before (us)', 'after (us)', 'ratio')
+    for style in ('full', 'compact', 'summary'):
+        timings = []
+        for before in (True, False):
+            def run():
+                make_tables(builder, style, games, before)
+            run()  # warm up e.g. image reads
+            seconds = min(timeit.repeat(run, number=rounds, repeat=3))
+            timings.append(seconds / (rounds * len(games)) * 1e6)
+        print '%-8s %12.1f %12.1f %7.2fx' % (
+            style, timings[0], timings[1], timings[0] / timings[1])
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
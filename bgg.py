@@ -11,369 +11,449 @@ Notes:
 # future
 from __future__ import division
 # lib
-import json
-import math
-import os
-import tempfile
+from itertools import islice, izip
+from multiprocessing.pool import ThreadPool
+import xml.etree.ElementTree as ET
 # third party
+import numpy
+import requests
 from boardgamegeek import BoardGameGeek
-from boardgamegeek.exceptions import BoardGameGeekAPIRetryError
+from boardgamegeek.api import html_parser
+from boardgamegeek.collection import Collection
+from boardgamegeek.exceptions import BoardGameGeekAPIError, \
+    BoardGameGeekAPIRetryError, BoardGameGeekAPINonXMLError
+from boardgamegeek.games import BoardGame
+from boardgamegeek.utils import xml_subelement_attr, \
+    xml_subelement_attr_list, xml_subelement_text
+# local
+from gamefile import load_games, raw_value
+from profiling import count, timed, timer
+from record import GameRecord, RAW_FIELDS
+from throttle import TokenBucket, with_retry
+
+BATCH_SIZE = 20  # max. no. of game IDs sent in one BGG "thing" API request
 
 
 class BGGGameList(object):
-    """Lists which are groups of multiple games' string-based properties."""
-
-    def __init__(self):
-        """create empty lists to hold values"""
-        self.alternative_names = []
-        self.artists = []
-        self.average = []
-        self.averageweight = []
-        self.bayesaverage = []
-        self.categories = []
-        self.description = []
-        self.designers = []
-        self.expands = []
-        self.expansion = []
-        self.expansions = []
-        self.families = []
-        self.id = []
-        self.image = []
-        self.implementations = []
-        self.maxplayers = []
-        self.mechanics = []
-        self.median = []
-        self.minage = []
-        self.minplayers = []
-        self.name = []
-        self.numcomments = []
-        self.numweights = []
-        self.owned = []
-        self.playingtime = []
-        self.publishers = []
-        self.ranks = []
-        self.stddev = []
-        self.thumbnail = []
-        self.trading = []
-        self.usersrated = []
-        self.wanting = []
-        self.wishing = []
-        self.yearpublished = []
-        # custom fields
-        self.players = []
-        self.description_short = []
-        self.age = []
+    """Columnar store of many games' properties; one column per field.
+
+    Numeric fields are held as NumPy arrays (missing values are NaN) so that
+    filtering, sorting and summary statistics are vectorised; other fields
+    are created, as lists of string formatted values, when they are needed.
+
+    Example:
+
+        games = BGGGameList(bgg_games(user='shurelock', number=500))
+        light = games.filter(games.where('averageweight', '<', 2.5))
+        light.sort('rank').stats('playingtime')
+    """
+
+    NUMERIC_FIELDS = (
+        'average', 'averageweight', 'bayesaverage', 'maxplayers', 'median',
+        'minage', 'minplayers', 'numcomments', 'numweights', 'owned',
+        'playingtime', 'rank', 'stddev', 'trading', 'usersrated', 'wanting',
+        'wishing', 'yearpublished')
+    OPERATORS = {
+        '<': numpy.less, '<=': numpy.less_equal, '>': numpy.greater,
+        '>=': numpy.greater_equal, '==': numpy.equal, '!=': numpy.not_equal}
+
+    def __init__(self, games=None):
+        """
+        Args:
+            games: list
+                BGGGame objects (or similar) to add to the store
+        """
+        self.games = []
+        self.columns = dict((field, []) for field in self.NUMERIC_FIELDS)
+        self.arrays = {}  # NumPy versions of the columns; built on demand
+        for game in games or []:
+            self.set_values(game)
+
+    def __len__(self):
+        return len(self.games)
+
+    def __iter__(self):
+        return iter(self.games)
 
     def set_values(self, game):
-        """Append a game's property to a matching list."""
-        self._game = game  # BGGGame object
-        if self._game:
-            self.alternative_names.append(self._game.alternative_names)
-            self.artists.append(self._game.artists)
-            self.average.append(self._game.average)
-            self.averageweight.append(self._game.averageweight)
-            self.bayesaverage.append(self._game.bayesaverage)
-            self.categories.append(self._game.categories)
-            self.description_short.append(self._game.description_short)
-            self.description.append(self._game.description)
-            self.designers.append(self._game.designers)
-            self.expands.append(self._game.expands)
-            self.expansion.append(self._game.expansion)
-            self.expansions.append(self._game.expansions)
-            self.families.append(self._game.families)
-            self.id.append(self._game.id)
-            self.image.append(self._game.image)
-            self.implementations.append(self._game.implementations)
-            self.maxplayers.append(self._game.maxplayers)
-            self.mechanics.append(self._game.mechanics)
-            self.median.append(self._game.median)
-            self.minage.append(self._game.minage)
-            self.minplayers.append(self._game.minplayers)
-            self.name.append(self._game.name)
-            self.numcomments.append(self._game.numcomments)
-            self.numweights.append(self._game.numweights)
-            self.owned.append(self._game.owned)
-            self.playingtime.append(self._game.playingtime)
-            self.publishers.append(self._game.publishers)
-            self.ranks.append(self._game.ranks)
-            self.stddev.append(self._game.stddev)
-            self.thumbnail.append(self._game.thumbnail)
-            self.trading.append(self._game.trading)
-            self.usersrated.append(self._game.usersrated)
-            self.wanting.append(self._game.wanting)
-            self.wishing.append(self._game.wishing)
-            self.yearpublished.append(self._game.yearpublished)
-            # custom fields
-            self.players.append(self._game.players)
-            self.description_short.append(self._game.description_short)
-            self.age.append(self._game.age)
-
-
-class BGGGame(object):
+        """Append a game, and its numeric properties to matching columns."""
+        if game:
+            self.games.append(game)
+            for field in self.NUMERIC_FIELDS:
+                value = getattr(game, '_%s' % field, None)
+                if value is None:
+                    value = getattr(game, field, None)
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    value = numpy.nan
+                self.columns[field].append(value)
+            self.arrays = {}
+
+    def column(self, field):
+        """Return a field's values; a NumPy array for numeric fields."""
+        if field in self.NUMERIC_FIELDS:
+            if field not in self.arrays:
+                self.arrays[field] = numpy.array(
+                    self.columns[field], dtype=float)
+            return self.arrays[field]
+        return [getattr(game, field, '') for game in self.games]
+
+    def where(self, field, operator, value):
+        """Return a boolean array; True for games meeting the condition.
+
+        Games with no value for the field never meet the condition.
+        """
+        values = self.column(field)
+        with numpy.errstate(invalid='ignore'):
+            return self.OPERATORS[operator](values, value) & \
+                ~numpy.isnan(values)
+
+    def take(self, indices):
+        """Return a new BGGGameList holding only the games at indices."""
+        subset = BGGGameList()
+        subset.games = [self.games[index] for index in indices]
+        for field in self.NUMERIC_FIELDS:
+            array = self.column(field)[indices]
+            subset.arrays[field] = array
+            subset.columns[field] = array.tolist()
+        return subset
+
+    def filter(self, mask):
+        """Return a new BGGGameList of the games where mask is True."""
+        return self.take(numpy.flatnonzero(mask))
+
+    def sort(self, field, reverse=False):
+        """Return a new BGGGameList sorted on a numeric field.
+
+        Games with no value for the field are always placed last.
+        """
+        values = self.column(field)
+        if reverse:
+            values = -values
+        return self.take(numpy.argsort(values, kind='mergesort'))
+
+    def stats(self, field):
+        """Return summary statistics for a numeric field, ignoring gaps."""
+        values = self.column(field)
+        values = values[~numpy.isnan(values)]
+        if not len(values):
+            return {'count': 0}
+        return {
+            'count': len(values),
+            'min': values.min(),
+            'max': values.max(),
+            'mean': values.mean(),
+            'median': numpy.median(values),
+            'std': values.std(),
+        }
+
+    def summary(self):
+        """Return summary statistics for all numeric fields."""
+        return dict((field, self.stats(field))
+                    for field in self.NUMERIC_FIELDS)
+
+
+class BGGGame(GameRecord):
     """Wrapper around the `game` object from the boardgamegeek API"""
 
-    def __init__(self, game_id, short=500):
+    __slots__ = ()
+
+    @timed('BGGGame')
+    def __init__(self, game_id=None, short=500, game=None, bgg=None):
         """
         Args:
+            game_id: int or string
+                BGG ID (or name) of the game to retrieve
             short: int
                 number of characters to use for short description
+            game: BoardGame
+                game already retrieved from BGG (e.g. via `fetch_games`);
+                if supplied, then game_id is ignored
+            bgg: BoardGameGeek
+                API client to use; default is a new, uncached client
         """
-        self._game = None
-        self.short = int(short) or 500
-        self.bgg = BoardGameGeek(disable_ssl=True)
-        if isinstance(game_id, int):
-            self._game = self.bgg.game(game_id=game_id)
-        elif isinstance(game_id, ""):
-            self._game = self.bgg.game(name=game_id)
-        else:
-            print
-        self.set_properties()
-
-    def get_description_custom(self):
-        """Create a custom, abbreviated description for a game."""
-        if self._game:
-            desc = self._game.description[0:self.short]
-            _cut = int(
-                (len(desc) -
-                 len(desc.replace(',', '').replace('.', '').replace(':', '')))
-                / 2 + self.short)
-            desc = self._game.description[0:_cut]
-            return desc[0:-3] + '...'
-
-    def HTML_description(self, text):
-        """Changes the BGG [] notation to <> and adds line breaks"""
-        #print "bgg.self._game.description\n", self._game.description
-        return self._game.description.replace('[', '<').replace(']', '>').\
-            replace('\n', '<br/>')
-
-    def set_properties(self):
-        """Create both raw (_ prefix) and string formatted versions of props"""
-        if self._game:
-            self._alternative_names = self._game.alternative_names
-            self.alternative_names = ', '.join(self._game.alternative_names)
-            self._artists = self._game.artists
-            self.artists = ', '.join(self._game.artists)
-            self._average = self._game.average
-            self.average = '%.3f' % self._game.average
-            self._averageweight = self._game.averageweight
-            self.averageweight = '%.2f' % self._game.averageweight
-            self.percentageweight = '%s' % math.ceil(self._game.averageweight * 20.0)
-            self._bayesaverage = self._game.bayesaverage
-            self.bayesaverage = '%.3f' % self._game.bayesaverage
-            self._categories = self._game.categories
-            self.categories = ', '.join(self._game.categories)
-            self._description = self._game.description
-            self.description = '%s' % self._game.description
-            self.description_html = '%s' % \
-                self.HTML_description(self._game.description)
-            try:
-                self.description_short = '%s' % self._game.description_short
-                self.description_short_html = '%s' % \
-                    self.HTML_description(self._game.description_short)
-            except AttributeError:
-                self.description_short = ''
-                self.description_short_html = ''
-            self._designers = self._game.designers
-            self.designers = ', '.join(self._game.designers)
-            self._expands = self._game.expands
-            self.expands = ', '.join([exp.name for exp in self._game.expands])
-            self._expansion = self._game.expansion
-            if self._game.expansion is True:
-                self.expansion = 'Yes'
-            else:
-                self.expansion = 'No'
-            self._expansions = self._game.expansions
-            self.expansions = ', '.join(
-                [exp.name for exp in self._game.expansions])
-            self._families = self._game.families
-            self.families = ', '.join(self._game.families)
-            self._id = self._game.id
-            self.id = '%s' % self._game.id
-            self._image = self._game.image
-            self.image = '%s' % self._game.image
-            self._implementations = self._game.implementations
-            self.implementations = ', '.join(self._game.implementations)
-            self._maxplayers = self._game.maxplayers
-            self.maxplayers = '%s' % self._game.maxplayers
-            self._mechanics = self._game.mechanics
-            self.mechanics = ', '.join(self._game.mechanics)
-            self._median = self._game.median
-            self.median = '%.3f' % self._game.median
-            self._minage = self._game.minage
-            self.minage = '%s' % self._game.minage
-            self._minplayers = self._game.minplayers
-            self.minplayers = '%s' % self._game.minplayers
-            self._name = self._game.name
-            self.name = '%s' % self._game.name
-            self._numcomments = self._game.numcomments
-            self.numcomments = '%s' % self._game.numcomments
-            self._numweights = self._game.numweights
-            self.numweights = '%s' % self._game.numweights
-            self._owned = self._game.owned
-            self.owned = '%s' % self._game.owned
-            self._playingtime = self._game.playingtime
-            self.playingtime = '%s' % self._game.playingtime
-            self._publishers = self._game.publishers
-            self.publishers = ', '.join(self._game.publishers)
-            self._ranks = self._game.ranks
-            self.ranks = '%s' % self._game.ranks
-            self._stddev = self._game.stddev
-            self.stddev = '%.3f' % self._game.stddev
-            self._thumbnail = self._game.thumbnail
-            self.thumbnail = '%s' % self._game.thumbnail
-            self._trading = self._game.trading
-            self.trading = '%s' % self._game.trading
-            self._usersrated = self._game.usersrated
-            self.usersrated = '%s' % self._game.usersrated
-            self._wanting = self._game.wanting
-            self.wanting = '%s' % self._game.wanting
-            self._wishing = self._game.wishing
-            self.wishing = '%s' % self._game.wishing
-            self._yearpublished = self._game.yearpublished
-            self.yearpublished = '%s' % self._game.yearpublished
-            # custom fields
-            self.description_custom = self.get_description_custom()
-            self._description_custom = self.description_custom
-            if self._game.minplayers == self._game.maxplayers:
-                    self.players = '%s' % self._game.maxplayers
-            else:
-                self.players = '%s-%s' % (self._game.minplayers,
-                                          self._game.maxplayers)
-            self._players = (self._game.minplayers, self._game.maxplayers)
-            self.age = '%s+' % self._game.minage
-            self._age = self._game.minage
+        if not game:
+            bgg = bgg or BoardGameGeek(disable_ssl=True)
+            if isinstance(game_id, int):
+                game = bgg.game(game_id=game_id)
+            elif isinstance(game_id, basestring):
+                game = bgg.game(name=game_id)
+        values = {}
+        if game:
+            for field in RAW_FIELDS:
+                values[field] = getattr(game, field, None)
+        super(BGGGame, self).__init__(short=short, **values)
 
 
-class GameObject(object):
+class GameObject(GameRecord):
+    """Game created from a dict of raw (_ prefix) values e.g. from a file"""
+
+    __slots__ = ()
 
     def __init__(self, game_dict, short=500):
         """
         Args:
+            game_dict: dict
+                raw values keyed on field name, with a _ prefix
             short: int
                 number of characters to use for short description
         """
-        self.game_dict = game_dict
-        self.short = int(short) or 500
-        self.set_properties(self.game_dict)
-
-    def get_description_custom(self):
-        """Create a custom, abbreviated description for a game."""
-        if self.game_dict:
-            desc = self.game_dict.get('_description', '')[0:self.short]
-            _cut = int(
-                (len(desc) -
-                 len(desc.replace(',', '').replace('.', '').replace(':', '')))
-                / 2 + self.short)
-            desc = self.game_dict.get('_description', '')[0:_cut]
-            return desc[0:-3] + '...'
-
-    def HTML_description(self, text):
-        """Changes the BGG [] notation to <> and adds line breaks"""
-        #print "bgg.self._game.description\n", self._game.description
-        return self.game_dict.get('_description', '').replace('[', '<').\
-            replace(']', '>').replace('\n', '<br/>')
-
-    def set_properties(self, game_dict):
-        """Create both raw (_ prefix) and string formatted versions of props"""
+        values = {}
         if game_dict:
-            self._alternative_names = game_dict.get('_alternative_names')
-            self.alternative_names = ', '.join(game_dict.get('alternative_names'))
-            self._artists = game_dict.get('_artists')
-            self.artists = ', '.join(game_dict.get('artists'))
-            self._average = game_dict.get('_average')
-            self.average = '%.3f' % game_dict.get('_average')
-            self._averageweight = game_dict.get('_averageweight')
-            self.averageweight = '%.2f' % game_dict.get('_averageweight')
-            self.percentageweight = \
-                '%s' % math.ceil(game_dict.get('_averageweight') * 20.0)
-            self._bayesaverage = game_dict.get('_bayesaverage')
-            self.bayesaverage = '%.3f' % game_dict.get('_bayesaverage')
-            self._categories = game_dict.get('_categories')
-            self.categories = ', '.join(game_dict.get('_categories'))
-            self._description = game_dict.get('_description')
-            self.description = '%s' % game_dict.get('_description')
-            self.description_html = '%s' % \
-                self.HTML_description(game_dict.get('_description'))
-            self.description_short = '%s' % game_dict.get('_description_short')
-            self.description_short_html = '%s' % \
-                self.HTML_description(game_dict.get('_description_short'))
-            self._designers = game_dict.get('_designers')
-            self.designers = ', '.join(game_dict.get('_designers'))
-            self._expands = game_dict.get('_expands')
-            self.expands = \
-                ', '.join([exp.name for exp in game_dict.get('_expands')])
-            self._expansion = game_dict.get('_expansion')
-            if game_dict.get('_expansion') is True:
-                self.expansion = 'Yes'
-            else:
-                self.expansion = 'No'
-            self._expansions = game_dict.get('_expansions')
-            self.expansions = ', '.join(
-                [exp.name for exp in game_dict.get('_expansions')])
-            self._families = game_dict.get('_families')
-            self.families = ', '.join(game_dict.get('_families'))
-            self._id = game_dict.get('_id')
-            self.id = '%s' % game_dict.get('_id')
-            self._image = game_dict.get('_image')
-            self.image = '%s' % game_dict.get('_image')
-            self._implementations = game_dict.get('_implementations')
-            self.implementations = ', '.join(game_dict.get('_implementations'))
-            self._maxplayers = game_dict.get('_maxplayers')
-            self.maxplayers = '%s' % game_dict.get('_maxplayers')
-            self._mechanics = game_dict.get('_mechanics')
-            self.mechanics = ', '.join(game_dict.get('_mechanics'))
-            self._median = game_dict.get('_median')
-            self.median = '%.3f' % game_dict.get('_median')
-            self._minage = game_dict.get('_minage')
-            self.minage = '%s' % game_dict.get('_minage')
-            self._minplayers = game_dict.get('_minplayers')
-            self.minplayers = '%s' % game_dict.get('_minplayers')
-            self._name = game_dict.get('_name')
-            self.name = '%s' % game_dict.get('_name')
-            self._numcomments = game_dict.get('_numcomments')
-            self.numcomments = '%s' % game_dict.get('_numcomments')
-            self._numweights = game_dict.get('_numweights')
-            self.numweights = '%s' % game_dict.get('_numweights')
-            self._owned = game_dict.get('_owned')
-            self.owned = '%s' % game_dict.get('_owned')
-            self._playingtime = game_dict.get('_playingtime')
-            self.playingtime = '%s' % game_dict.get('_playingtime')
-            self._publishers = game_dict.get('_publishers')
-            self.publishers = ', '.join(game_dict.get('_publishers'))
-            self._ranks = game_dict.get('_ranks')
-            self.ranks = '%s' % game_dict.get('_ranks')
-            self._stddev = game_dict.get('_stddev')
-            self.stddev = '%.3f' % game_dict.get('_stddev')
-            self._thumbnail = game_dict.get('_thumbnail')
-            self.thumbnail = '%s' % game_dict.get('_thumbnail')
-            self._trading = game_dict.get('_trading')
-            self.trading = '%s' % game_dict.get('_trading')
-            self._usersrated = game_dict.get('_usersrated')
-            self.usersrated = '%s' % game_dict.get('_usersrated')
-            self._wanting = game_dict.get('_wanting')
-            self.wanting = '%s' % game_dict.get('_wanting')
-            self._wishing = game_dict.get('_wishing')
-            self.wishing = '%s' % game_dict.get('_wishing')
-            self._yearpublished = game_dict.get('_yearpublished')
-            self.yearpublished = '%s' % game_dict.get('_yearpublished')
-            # custom fields
-            self.description_custom = self.get_description_custom()
-            self._description_custom = self.description_custom
-            if game_dict.get('_minplayers') == game_dict.get('_maxplayers'):
-                    self.players = '%s' % game_dict.get('_maxplayers')
-            else:
-                self.players = '%s-%s' % (game_dict.get('_minplayers'),
-                                          game_dict.get('_maxplayers'))
-            self._players = (game_dict.get('_minplayers'),
-                             game_dict.get('_maxplayers'))
-            self.age = '%s+' % game_dict.get('_minage')
-            self._age = game_dict.get('_minage')
+            for field in RAW_FIELDS:
+                values[field] = raw_value(game_dict.get('_%s' % field))
+            for field in ('expands', 'expansions'):
+                if not isinstance(values[field], list):
+                    values[field] = []  # e.g. stringified by older versions
+        super(GameObject, self).__init__(short=short, **values)
 
 
-def bgg_games(ids=None, user=None, filename=None, number=None, progress=False,
-              **kwargs):
+def parse_game(item):
+    """Create a BoardGame from an <item> element of a BGG "thing" response.
+
+    Mirrors the parsing done by `BoardGameGeek.game()`, which can only handle
+    one ID per request.  Returns None for items that are not boardgames.
+    """
+    game_type = item.attrib.get("type")
+    if game_type not in ["boardgame", "boardgameexpansion"]:
+        return None
+    data = {
+        "id": int(item.attrib["id"]),
+        "thumbnail": xml_subelement_text(item, "thumbnail"),
+        "image": xml_subelement_text(item, "image"),
+        "expansion": game_type == "boardgameexpansion",
+        "families": xml_subelement_attr_list(
+            item, ".//link[@type='boardgamefamily']"),
+        "categories": xml_subelement_attr_list(
+            item, ".//link[@type='boardgamecategory']"),
+        "implementations": xml_subelement_attr_list(
+            item, ".//link[@type='boardgameimplementation']"),
+        "mechanics": xml_subelement_attr_list(
+            item, ".//link[@type='boardgamemechanic']"),
+        "designers": xml_subelement_attr_list(
+            item, ".//link[@type='boardgamedesigner']"),
+        "artists": xml_subelement_attr_list(
+            item, ".//link[@type='boardgameartist']"),
+        "publishers": xml_subelement_attr_list(
+            item, ".//link[@type='boardgamepublisher']"),
+        "expands": [],
+        "expansions": [],
+    }
+    for link in item.findall(".//link[@type='boardgameexpansion']"):
+        exp = {"id": link.attrib["id"], "name": link.attrib["value"]}
+        if link.attrib.get("inbound", "false").lower()[0] == 't':
+            data["expands"].append(exp)
+        else:
+            data["expansions"].append(exp)
+    data["description"] = xml_subelement_text(
+        item, "description", convert=html_parser.unescape, quiet=True)
+    for key in ["yearpublished", "minplayers", "maxplayers", "playingtime",
+                "minage"]:
+        data[key] = xml_subelement_attr(item, key, convert=int, quiet=True)
+    data["name"] = xml_subelement_attr(item, ".//name[@type='primary']")
+    data["alternative_names"] = xml_subelement_attr_list(
+        item, ".//name[@type='alternate']")
+    stats = item.find(".//ratings")
+    for key in ["usersrated", "owned", "trading", "wanting", "wishing",
+                "numcomments", "numweights"]:
+        data[key] = xml_subelement_attr(stats, key, convert=int, quiet=True)
+    for key in ["average", "bayesaverage", "stddev", "median",
+                "averageweight"]:
+        data[key] = xml_subelement_attr(stats, key, convert=float, quiet=True)
+    data["ranks"] = []
+    for rank in item.findall(".//rank"):
+        try:
+            value = int(rank.attrib.get("value"))
+        except (TypeError, ValueError):
+            value = None
+        data["ranks"].append({"name": rank.attrib.get("name"),
+                              "friendlyname": rank.attrib.get("friendlyname"),
+                              "value": value})
+    return BoardGame(data)
+
+
+def get_xml_response(bgg, url, params):
+    """Make a single request to the BGG XML API; return the parsed XML.
+
+    Unlike the library's `get_parsed_xml_response`, the request is never
+    retried here - that is left to `with_retry` - so a reply asking for a
+    retry (HTTP 202 or 503), or a timeout, raises BoardGameGeekAPIRetryError.
+    """
+    try:
+        reply = bgg.requests_session.get(url, params=params,
+                                         timeout=bgg._timeout)
+    except requests.exceptions.Timeout:
+        raise BoardGameGeekAPIRetryError('BGG did not reply in time')
+    if reply.status_code in (202, 503):
+        raise BoardGameGeekAPIRetryError(
+            'BGG is busy (HTTP %d)' % reply.status_code)
+    if not (reply.headers.get('content-type') or '').startswith('text/xml'):
+        raise BoardGameGeekAPINonXMLError('non-XML reply')
+    try:
+        return ET.fromstring(reply.text.encode('utf-8'))
+    except ET.ParseError as err:
+        raise BoardGameGeekAPIError(
+            'error decoding BGG API response: %s' % err)
+
+
+@timed('fetch_games')
+def fetch_games(bgg, ids):
+    """Retrieve many games from BGG with a single "thing" API request.
+
+    Args:
+        bgg: BoardGameGeek
+            API client whose session (and cache) is used for the request
+        ids: list
+            games IDs (integers) used by BGG
+
+    Returns:
+        dict of BoardGame objects, keyed on game ID; IDs which could not be
+        found (or which are not boardgames) are omitted
+    """
+    if not ids:
+        return {}
+    count('games requested from BGG', len(ids))
+    try:
+        root = get_xml_response(
+            bgg, bgg._thing_api_url,
+            params={"id": ','.join(['%s' % game_id for game_id in ids]),
+                    "stats": 1})
+    except BoardGameGeekAPINonXMLError:
+        return {}
+    games = {}
+    for item in root.findall("item"):
+        game = parse_game(item)
+        if game:
+            games[game.id] = game
+    return games
+
+
+def fetch_collection(bgg, user, **params):
+    """Retrieve a user's collection from BGG.
+
+    Mirrors `BoardGameGeek.collection()`, but also keeps the number of plays
+    of each game and allows the listing to be narrowed by BGG; for example,
+    own=1 only lists games owned by the user.
+
+    Returns:
+        Collection object; or None if the user's collection is unavailable
+    """
+    params.update({"username": user, "stats": 1})
+    try:
+        root = get_xml_response(bgg, bgg._collection_api_url, params)
+    except BoardGameGeekAPINonXMLError:
+        return None
+    if root.find(".//error") is not None:
+        return None
+    collection = Collection({"owner": user, "items": []})
+    for item in root.findall(".//item[@subtype='boardgame']"):
+        game = {
+            "name": xml_subelement_text(item, "name"),
+            "id": int(item.attrib.get("objectid")),
+            "rating": xml_subelement_attr(
+                item.find("stats"), "rating", convert=float, quiet=True),
+            "numplays": xml_subelement_text(
+                item, "numplays", convert=int, quiet=True) or 0,
+        }
+        status = item.find("status")
+        for stat in ["lastmodified", "own", "preordered", "prevowned", "want",
+                     "wanttobuy", "wanttoplay", "fortrade", "wishlist",
+                     "wishlistpriority"]:
+            game[stat] = status.attrib.get(stat) if status is not None \
+                else None
+        collection.add_game(game)
+    return collection
+
+
+def cached_games(bgg, ids, cache=None, progress=False, limiter=None):
+    """Retrieve games from the cache where possible; else from BGG.
+
+    Args:
+        bgg: BoardGameGeek
+            API client used for games not in the cache
+        ids: list
+            games IDs (integers) used by BGG
+        cache: GameCache
+            persistent store of game data; if None, all games come from BGG
+        progress: boolean
+            show which games are being retrieved
+        limiter: TokenBucket
+            rate limiter shared by all requests made to BGG
+
+    Returns:
+        dict of BoardGame objects, keyed on game ID
+    """
+    games = {}
+    if cache:
+        for game_id, data in cache.get_many(ids).items():
+            games[game_id] = BoardGame(data)
+    missing = [game_id for game_id in ids if game_id not in games]
+    if progress:
+        for game_id in missing:
+            print "Retrieving game %7d from BGG !" % game_id
+
+    def fetch():
+        if limiter:
+            limiter.take()
+        return fetch_games(bgg, missing)
+
+    if missing:
+        fetched = with_retry(fetch, progress=progress)
+    else:
+        fetched = {}
+    if cache:
+        for game_id, game in fetched.items():
+            cache.set(game_id, game.data())
+    games.update(fetched)
+    return games
+
+
+def file_games(filename, number=None):
+    """Generate GameObjects from a JSON or JSONL file.
+
+    Args:
+        filename: string
+            name of file containing game data saved in JSON or JSONL format
+        number: integer
+            max no. of games to generate; if None, all games in the file
+    """
+    for game_dict in islice(load_games(filename), number):
+        yield GameObject(game_dict)
+
+
+def bgg_client():
+    """Create a BoardGameGeek API client."""
+    # requests are throttled by a TokenBucket, not by the library's adapter,
+    # and retried by with_retry, not by the library
+    return BoardGameGeek(cache="memory:///?ttl=1000", disable_ssl=True,
+                         requests_per_minute=60 * 60, retries=0)
+
+
+def bgg_games(*args, **kwargs):
     """Return a list of BoardGameGeek games; sourced by ID, or user, or file
 
+    Takes the same arguments as `iter_bgg_games`; and also:
+
+        stream: boolean
+            if True, return a generator of the games - which are yielded as
+            soon as they are retrieved - rather than a list
+    """
+    stream = kwargs.pop('stream', False)
+    games = iter_bgg_games(*args, **kwargs)
+    return games if stream else list(games)
+
+
+def iter_bgg_games(ids=None, user=None, filename=None, number=None,
+                   progress=False, batch_size=BATCH_SIZE, cache=None,
+                   workers=1, limiter=None, sync=None, query=None, bgg=None,
+                   **kwargs):
+    """Generate BoardGameGeek games; sourced by ID, or user, or file
+
+    Games are yielded as each batch is retrieved from BGG (or the cache) -
+    unless they must be sorted on their details, in which case they are all
+    retrieved first.
+
     Args:
         ids: list
             games IDs (integers) used by BGG
@@ -381,54 +461,138 @@ def bgg_games(ids=None, user=None, filename=None, number=None, progress=False,
             BGG user name; if supplied, then :
             * IDs will be ignored
         filename: string
-            name of file containing game data saved in JSON format
+            name of file containing game data saved in JSON (or, if the name
+            ends with .jsonl, JSONL) format
         number: integer
             max no. of valid games to retrieve; default is 10
         progress: boolean
             show which games are being retrieved
+        batch_size: integer
+            max. no. of games retrieved from BGG per API request
+        cache: GameCache
+            persistent store of game data, used in preference to BGG
+        workers: integer
+            no. of requests which can be made to BGG at the same time
+        limiter: TokenBucket
+            rate limiter for requests to BGG; default is a new TokenBucket
+        sync: CollectionSync
+            snapshots of users' collections; if supplied with a user, only
+            games added or modified since the last snapshot are retrieved
+        query: GameQuery
+            conditions which games must meet, and the order to return them
+            in; conditions on a user's collection are checked before any
+            game details are retrieved
+        bgg: BoardGameGeek
+            API client, e.g. shared by many reports; default is a new client
     """
+    batch_size = int(batch_size or BATCH_SIZE)
+    workers = max(int(workers or 1), 1)
+    limiter = limiter or TokenBucket()
     if not number:
         number = 10
     else:
         number = int(number)
-    tmpdir = tempfile.mkdtemp()
-    predictable_filename = 'bgggames.cache'
-    dbname = os.path.join(tmpdir, predictable_filename)
-    bgg = BoardGameGeek(cache="sqlite://{}?ttl=1000".format(dbname),
-                        disable_ssl=True)
-    games = []
+    bgg = bgg or bgg_client()
+    sort = query is not None and query.needs_all
+    games = []  # only kept if the games are to be sorted
+    collection = None
+    known = {}  # games unchanged since the last sync
     if user:
         ids = []
-        #bgg_user = bgg.user(user)
+        params = query.collection_params() if query else {}
+
+        def fetch():
+            if limiter:
+                limiter.take()  # for each attempt, including retries
+            return fetch_collection(bgg, user, **params)
+
         try:
-            collection = bgg.collection(user)
+            with timer('fetch_collection'):
+                collection = with_retry(fetch, progress=progress)
             if collection:
-                for game in collection:
-                    ids.append(game.id)
+                if query:
+                    ids = query.select_ids(collection)
+                else:
+                    for game in collection:
+                        ids.append(game.id)
+                if sync:
+                    known = sync.unchanged(user, collection)
             else:
                 print 'Unable to retrieve collection for %s - do they exist?' \
                     % user
         except BoardGameGeekAPIRetryError, err:
             print err
+    elif query and query.has_collection_conditions:
+        print 'Conditions on a collection are ignored without a user'
+    # with a sort on game details, all games must be retrieved first
+    limit = None if sort else number
     if filename:
         try:
-            with open(filename) as json_file:
-                json_games = json.load(json_file)
-            for game_id in json_games.keys():
-                games.append(GameObject(json_games[game_id]))
+            selected = file_games(filename, None if query else number)
+            if query:
+                selected = islice(
+                    (game for game in selected if query.accepts(game)), limit)
+            for game in selected:
+                if sort:
+                    games.append(game)
+                else:
+                    yield game
         except ValueError:
             print 'Unable to load data from "%s" - please check it.' % filename
     elif ids:
+
+        @timed('bgg_games (batch)')
+        def retrieve(batch):
+            fetched = dict((game_id, known[game_id]) for game_id in batch
+                           if game_id in known)
+            fetched.update(cached_games(
+                bgg, [game_id for game_id in batch if game_id not in known],
+                cache=cache, progress=progress, limiter=limiter))
+            return fetched
+
+        pool = ThreadPool(workers) if workers > 1 else None
+        if limit is None:
+            limit = len(ids)
+        retrieved = []  # kept to save a snapshot of the collection
         count = 0
-        for game_id in ids:
-            if count >= number:
-                break
-            if progress:
-                print "Retrieving game %7d from BGG !" % game_id
-            _game = BGGGame(game_id=game_id)
-            # TODO - find out a way to filter by user.owned ...
-            flag = True
-            if flag:
-                games.append(_game)
-                count += 1
-    return games
+        start = 0
+        try:
+            while count < limit and start < len(ids):
+                # never ask for more games than are still needed
+                wanted = ids[start:start + limit - count]
+                start += len(wanted)
+                batches = [wanted[pos:pos + batch_size]
+                           for pos in range(0, len(wanted), batch_size)]
+                # batches are handed back in order, each as soon as it is ready
+                if pool:
+                    results = pool.imap(retrieve, batches)
+                else:
+                    results = (retrieve(batch) for batch in batches)
+                for batch, fetched in izip(batches, results):
+                    for game_id in batch:
+                        if game_id not in fetched:
+                            continue
+                        _game = BGGGame(game=fetched[game_id], bgg=bgg)
+                        if sync and collection:
+                            retrieved.append(_game)
+                        if not query or query.accepts(_game):
+                            count += 1
+                            if sort:
+                                games.append(_game)
+                            else:
+                                yield _game
+        finally:
+            if pool:
+                pool.terminate()  # nothing is left running if stopped early
+                pool.join()
+            if sync and collection:
+                # games retrieved before any error are kept; a listing
+                # narrowed by the query is merged into the snapshot
+                sync.save(user, collection, retrieved, partial=bool(params))
+        if progress and cache:
+            print cache.stats()
+        if sync and collection and progress:
+            print sync.stats()
+    if sort:
+        for game in query.sort_games(games)[:number]:
+            yield game
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Persistent, on-disc cache of game metadata retrieved from BoardGameGeek,
+    so that repeated reports only go to BGG for new (or expired) games.
+Notes:
+    Entries are keyed on BGG game ID and stored in a sqlite database, with
+    each entry carrying its own expiry time.
+"""
+# lib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), '.cache', 'gamereporter')
+CACHE_TTL = 24 * 60 * 60  # seconds
+CACHE_DB = 'games.sqlite'
+
+
+class GameCache(object):
+    """Store of raw BGG game data (as a dict), keyed on game ID.
+
+    A cache can be shared between threads; access to it is serialised.
+    """
+
+    def __init__(self, cache_dir=None, ttl=CACHE_TTL):
+        """
+        Args:
+            cache_dir: string
+                directory in which the cache database is kept; default is
+                ~/.cache/gamereporter
+            ttl: int
+                default no. of seconds before a cached entry expires
+        """
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.ttl = int(ttl)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.db = sqlite3.connect(os.path.join(self.cache_dir, CACHE_DB),
+                                  check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS games ('
+            ' id INTEGER PRIMARY KEY, data TEXT, expires REAL)')
+        self.db.commit()
+
+    def get(self, game_id):
+        """Return the data for a game; or None if missing or expired."""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT data, expires FROM games WHERE id = ?',
+                (int(game_id), )).fetchone()
+            if row and row[1] > time.time():
+                self.hits += 1
+                return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def get_many(self, ids):
+        """Return a dict of data for those games which are in the cache."""
+        found = {}
+        for game_id in ids:
+            data = self.get(game_id)
+            if data is not None:
+                found[game_id] = data
+        return found
+
+    def set(self, game_id, data, ttl=None):
+        """Store the data for a game; ttl overrides the cache's default."""
+        if ttl is None:
+            ttl = self.ttl
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO games (id, data, expires)'
+                ' VALUES (?, ?, ?)',
+                (int(game_id), json.dumps(data), time.time() + ttl))
+            self.db.commit()
+
+    def purge(self):
+        """Remove all expired entries; return the number removed."""
+        with self.lock:
+            cursor = self.db.execute(
+                'DELETE FROM games WHERE expires <= ?', (time.time(), ))
+            self.db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        """Return a summary of cache usage for this run."""
+        return 'Game cache: %d hits, %d misses (%s)' % (
+            self.hits, self.misses, self.cache_dir)
+
+
+class MemoryCache(object):
+    """In-process store of raw BGG game data, in front of an (optional)
+    GameCache; used to share games between reports made in one process.
+    """
+
+    def __init__(self, backing=None):
+        """
+        Args:
+            backing: GameCache
+                persistent cache used for games not yet held in memory; and
+                to which new games are also saved
+        """
+        self.backing = backing
+        self.games = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, game_id):
+        """Return the data for a game; or None if it is not available."""
+        return self.get_many([game_id]).get(game_id)
+
+    def get_many(self, ids):
+        """Return a dict of data for those games which are in the cache."""
+        with self.lock:
+            found = dict((game_id, self.games[game_id]) for game_id in ids
+                         if game_id in self.games)
+            self.hits += len(found)
+        missing = [game_id for game_id in ids if game_id not in found]
+        if self.backing and missing:
+            stored = self.backing.get_many(missing)
+            with self.lock:
+                self.games.update(stored)
+            found.update(stored)
+        with self.lock:
+            self.misses += len(ids) - len(found)
+        return found
+
+    def set(self, game_id, data, ttl=None):
+        """Store the data for a game (also in the backing cache, if any)."""
+        with self.lock:
+            self.games[game_id] = data
+        if self.backing:
+            self.backing.set(game_id, data, ttl=ttl)
+
+    def stats(self):
+        """Return a summary of cache usage in this process."""
+        summary = 'Memory cache: %d hits, %d misses, %d games held' % (
+            self.hits, self.misses, len(self.games))
+        if self.backing:
+            summary += '\n' + self.backing.stats()
+        return summary
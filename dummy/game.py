@@ -6,29 +6,33 @@ Purpose:
     Supply game-like objects that can be used to test GameReportBuilder without
     requiring access to boardgamegeek.com
 """
-import math
+from record import GameRecord
 
 
-class Game(object):
+def split_list(text):
+    """Split a comma-separated string into a list."""
+    return [item.strip() for item in text.split(',') if item.strip()]
 
-    def __init__(self, item):
 
-        self.id = item.get('id', 0)
-        self.averageweight = '%.2f' % item.get('averageweight', 0.0)
-        self.percentageweight = '%s' % math.ceil(item.get('averageweight', 0.0) * 20.0)
-        self.name = item.get('name', 'NAME?')
-        self.description = item.get('desc', 'NAME?')
-        self.description_html = item.get('desc', 'NAME?').\
-            replace('[', '<').replace(']', '>').replace('\n', '<br/>')
-        self.image = item.get('image', '')
-        self.categories =  item.get('categories', '???')
-        self.mechanics =  item.get('mechanics', '???')
-        self.players =  item.get('players', '1-100')
-        self.minplayers =  item.get('minplayers', '1')
-        self.maxplayers =  item.get('maxplayers', '1')
-        self.age =  item.get('age', '1+')
-        self.yearpublished =  item.get('yearpublished', '1000')
-        self.playingtime =  item.get('playingtime', '100')
+class Game(GameRecord):
+
+    __slots__ = ()
+
+    def __init__(self, item):
+        age = '%s' % item.get('age', '1+')
+        super(Game, self).__init__(
+            id=item.get('id', 0),
+            averageweight=item.get('averageweight', 0.0),
+            name=item.get('name', 'NAME?'),
+            description=item.get('desc', 'NAME?'),
+            image=item.get('image', ''),
+            categories=split_list(item.get('categories', '???')),
+            mechanics=split_list(item.get('mechanics', '???')),
+            minplayers=item.get('minplayers', 1),
+            maxplayers=item.get('maxplayers', 1),
+            minage=int(age.rstrip('+') or 1),
+            yearpublished=item.get('yearpublished', '1000'),
+            playingtime=item.get('playingtime', '100'))
 
 
 # example games - ALL text and images sourced from http://www.boardgamegeek.com
@@ -1,58 +1,128 @@
+#!/usr/bin/env python
 """
-Register a font or a font family. 
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Register a font or a font family, once per process.
+Notes:
+    Parsing a TrueType file is slow, so each face is only loaded the first
+    time it is registered; later registrations - e.g. by another
+    GameReportBuilder in the same process - reuse it.  (Only the glyphs
+    actually used are embedded in a PDF, when it is saved.)
+
+    If a font file is missing, a warning is printed and the face is skipped;
+    missing faces in a family are replaced by the family's regular face.
+
+    Example:
+
+    # http://www.1001freefonts.com/alegreya_sc.font
+    ttf_register('AlegreyaSC', family=True)
+
+    registers AlegreyaSCR, AlegreyaSCI, AlegreyaSCBI and AlegreyaSCB, from
+    AlegreyaSC-Regular.ttf, AlegreyaSC-Italic.ttf, AlegreyaSC-BoldItalic.ttf
+    and AlegreyaSC-Bold.ttf, as the AlegreyaSC family.
 """
+# lib
 import os
-from reportlab.pdfbase import pdfmetrics 
-from reportlab.pdfbase.ttfonts import TTFont 
-from reportlab.pdfbase.pdfmetrics import registerFontFamily 
+import threading
+import time
+# reportlab
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.pdfmetrics import registerFontFamily
+# local
+from profiling import profiler
 
-FONTS = '.local/share/fonts'
+FONTS = '.local/share/fonts'  # path for Ubuntu Linux
 HOME = os.path.expanduser("~")
 BASE = os.path.join(HOME, FONTS)
+# suffix of each face's font name, and of its file name, in a family
+FACES = (
+    ('R', 'Regular'),
+    ('B', 'Bold'),
+    ('I', 'Italic'),
+    ('BI', 'BoldItalic'),
+)
 
-def ttf_register(name, family=False, base_dir=BASE):
-    if not family:
-        pdfmetrics.registerFont(TTFont(name,
-        os.path.join(base_dir, '%s.ttf' % name)))
-    else:
-        pdfmetrics.registerFont(TTFont('%sR' % name,
-            os.path.join(base_dir, '%s-Regular.ttf' % name)))
-        pdfmetrics.registerFont(TTFont('%sI' % name,
-            os.path.join(base_dir, '%s-Italic.ttf' % name)))
-        pdfmetrics.registerFont(TTFont('%sBI' % name,
-            os.path.join(base_dir, '%s-BoldItalic.ttf' % name)))
-        pdfmetrics.registerFont(TTFont('%sB' % name,
-            os.path.join(base_dir, '%s-Bold.ttf' % name)))
-        registerFontFamily(
-            '%s', normal='%sR' % name, bold='%sB' % name, italic='%sI' % name,
-            boldItalic='%sBI' % name)
-    
-    """example:
-    
-    # http://www.1001freefonts.com/alegreya_sc.font
-    pdfmetrics.registerFont(TTFont('AlegreyaSCR',
-        os.path.join(base_dir, 'AlegreyaSC-Regular.ttf')))
-    pdfmetrics.registerFont(TTFont('AlegreyaSCI',
-        os.path.join(base_dir, 'AlegreyaSC-Italic.ttf')))
-    pdfmetrics.registerFont(TTFont('AlegreyaSCBI',
-        os.path.join(base_dir, 'AlegreyaSC-BoldItalic.ttf')))
-    pdfmetrics.registerFont(TTFont('AlegreyaSCB',
-        os.path.join(base_dir, 'AlegreyaSC-Bold.ttf')))
-    registerFontFamily(
-        'AlegreyaSC', normal='AlegreyaSCR', bold='AlegreyaSCB', italic='AlegreyaSCI',
-        boldItalic='AlegreyaSCBI') 
-
-    # http://www.1001freefonts.com/alegreya_sans_sc.font
-    pdfmetrics.registerFont(TTFont('AlegreyaSansSCR',
-        os.path.join(base_dir, 'AlegreyaSansSC-Regular.ttf')))
-    pdfmetrics.registerFont(TTFont('AlegreyaSansSCI',
-        os.path.join(base_dir, 'AlegreyaSansSC-Italic.ttf')))
-    pdfmetrics.registerFont(TTFont('AlegreyaSansSCBI',
-        os.path.join(base_dir, 'AlegreyaSansSC-BoldItalic.ttf')))
-    pdfmetrics.registerFont(TTFont('AlegreyaSansSCB',
-        os.path.join(base_dir, 'AlegreyaSansSC-Bold.ttf')))
-    registerFontFamily(
-        'AlegreyaSansSC', normal='AlegreyaSansSCR', bold='AlegreyaSansSCB', 
-        italic='AlegreyaSansSCI', boldItalic='AlegreyaSansSCBI') 
-    """
 
+class FontRegistry(object):
+    """Fonts registered with reportlab in this process, and load timings."""
+
+    def __init__(self):
+        self.faces = {}  # font name -> seconds taken to load it
+        self.families = {}  # family name -> True if it is available
+        self.missing = set()  # paths of font files not found
+        self.reused = 0
+        self.lock = threading.Lock()
+
+    def is_registered(self, name):
+        """Check if a font name can be used, e.g. in a ParagraphStyle."""
+        return name in self.faces or \
+            name in pdfmetrics.getRegisteredFontNames() or \
+            name in pdfmetrics.standardFonts
+
+    def register_face(self, name, path, warn=True):
+        """Register a TrueType font; return False if its file is missing."""
+        with self.lock:
+            if name in self.faces:
+                self.reused += 1
+                return True
+            if not os.path.exists(path):
+                if warn and path not in self.missing:
+                    print 'The font file %s is missing' % path
+                self.missing.add(path)
+                return False
+            start = time.time()
+            pdfmetrics.registerFont(TTFont(name, path))
+            self.faces[name] = time.time() - start
+            profiler.add('font load', self.faces[name])
+            return True
+
+    def register(self, name, family=False, base_dir=BASE):
+        """
+        Register a font or a font family; return False if it (or, for a
+        family, its regular face) is not available.
+        """
+        if not family:
+            return self.register_face(
+                name, os.path.join(base_dir, '%s.ttf' % name))
+        missing = [face for suffix, face in FACES if not self.register_face(
+            '%s%s' % (name, suffix),
+            os.path.join(base_dir, '%s-%s.ttf' % (name, face)), warn=False)]
+        with self.lock:
+            if name in self.families:
+                return self.families[name]
+            if 'Regular' in missing:
+                print 'The font family %s is not available (no %s-Regular.ttf'\
+                    ' in %s)' % (name, name, base_dir)
+                self.families[name] = False
+                return False
+            if missing:
+                print 'The font family %s has no %s face; using Regular' % (
+                    name, ', '.join(missing))
+            faces = dict(
+                (suffix, '%s%s' % (name, 'R' if face in missing else suffix))
+                for suffix, face in FACES)
+            registerFontFamily(
+                name, normal=faces['R'], bold=faces['B'],
+                italic=faces['I'], boldItalic=faces['BI'])
+            self.families[name] = True
+        return True
+
+    def load_time(self):
+        """Return the total no. of seconds spent loading font files."""
+        return sum(self.faces.values())
+
+    def stats(self):
+        """Return a summary of fonts registered in this process."""
+        return 'Fonts: %d faces loaded in %.2f seconds, %d reused, %d missing'\
+            % (len(self.faces), self.load_time(), self.reused,
+               len(self.missing))
+
+
+registry = FontRegistry()  # shared by everything in this process
+
+
+def ttf_register(name, family=False, base_dir=BASE):
+    """Register a font or a font family, via the process-wide registry."""
+    return registry.register(name, family=family, base_dir=base_dir)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Save games' details to - and load them back from - a JSON file.
+Notes:
+    A file holds a schema version, the list of fields saved, and the games
+    keyed on game ID; each game's raw (unformatted) values are saved, and
+    games are written to the file one at a time.
+
+    A missing value is saved as null; files from older versions may hold ""
+    instead, which is read back as missing (see `raw_value`).
+
+    In the line-delimited (JSONL) format, the first line holds the schema
+    version and fields, and each line after that holds one game; such files
+    can be read one game at a time.
+"""
+# lib
+from collections import OrderedDict
+import json
+# local
+from record import GameRecord
+
+JSON_VERSION = 1
+JSON_FIELDS = (
+    'id', 'name', 'alternative_names', 'yearpublished', 'description',
+    'image', 'thumbnail', 'minplayers', 'maxplayers', 'playingtime', 'minage',
+    'averageweight', 'average', 'bayesaverage', 'median', 'stddev', 'ranks',
+    'usersrated', 'numcomments', 'numweights', 'owned', 'trading', 'wanting',
+    'wishing', 'categories', 'mechanics', 'families', 'designers', 'artists',
+    'publishers', 'implementations', 'expansion', 'expands', 'expansions',
+)
+THINGS = ('expands', 'expansions')  # fields holding a list of games
+
+
+def raw_value(value):
+    """Return a value read from a file as a raw value; "" is missing."""
+    return None if value == '' else value
+
+
+def raw_record(record):
+    """Return a copy of a game's dict, read from a file, without the fields
+    which are missing (e.g. a BoardGame needs a list of ranks, or none)."""
+    return dict((key, value) for key, value in record.items()
+                if raw_value(value) is not None)
+
+
+def game_record(game):
+    """Return an (ordered) dict of a game's raw values, for JSON_FIELDS;
+    missing values are None."""
+    record = OrderedDict()
+    for field in JSON_FIELDS:
+        value = getattr(game, '_%s' % field, None)
+        if value is None and not isinstance(game, GameRecord):
+            value = getattr(game, field, None)  # e.g. for other game objects
+        if field in THINGS and isinstance(value, list):
+            value = [thing if isinstance(thing, dict) else
+                     {'id': thing.id, 'name': thing.name} for thing in value]
+        record[field] = value
+    return record
+
+
+def write_json(games, out_file, compact=False):
+    """Write games to an open file, one game at a time.
+
+    Args:
+        games: iterable
+            BGGGame objects (or similar)
+        out_file: file
+            file opened for writing
+        compact: boolean
+            if True, do not indent the JSON
+    """
+    if compact:
+        comma, colon, indent, newline = ',', ':', None, ''
+    else:
+        comma, colon, indent, newline = ',', ': ', 2, '\n'
+    out_file.write('{%s"version"%s%s%s%s' % (
+        newline, colon, JSON_VERSION, comma, newline))
+    out_file.write('"fields"%s%s%s%s' % (
+        colon, json.dumps(JSON_FIELDS, separators=(comma, colon)), comma,
+        newline))
+    out_file.write('"games"%s{%s' % (colon, newline))
+    for number, game in enumerate(games):
+        record = game_record(game)
+        dump = json.dumps(record, indent=indent, separators=(comma, colon))
+        if indent:
+            dump = dump.replace('\n', '\n  ')
+        if number:
+            out_file.write(comma + newline)
+        out_file.write('%s"%s"%s%s' % (
+            ' ' * (indent or 0), record['id'], colon, dump))
+    out_file.write('%s}%s}\n' % (newline, newline))
+
+
+def write_jsonl(games, out_file):
+    """Write games to an open file, as one line of JSON per game.
+
+    Args:
+        games: iterable
+            BGGGame objects (or similar)
+        out_file: file
+            file opened for writing
+    """
+    header = OrderedDict([('version', JSON_VERSION),
+                          ('fields', JSON_FIELDS)])
+    out_file.write(json.dumps(header, separators=(',', ':')) + '\n')
+    for game in games:
+        out_file.write(
+            json.dumps(game_record(game), separators=(',', ':')) + '\n')
+
+
+def is_jsonl(filename):
+    """Check if a file name is for a line-delimited JSON file."""
+    return filename.lower().endswith('.jsonl')
+
+
+def load_jsonl(filename):
+    """Generate game dicts, as used by GameObject, from a JSONL file.
+
+    Lines are only read as they are needed, so the whole file is not loaded
+    unless every game in it is used.
+    """
+    with open(filename) as json_file:
+        for line in json_file:
+            if not line.strip():
+                continue
+            record = json.loads(line, object_pairs_hook=OrderedDict)
+            if 'id' not in record:  # header
+                if record.get('version', JSON_VERSION) > JSON_VERSION:
+                    raise ValueError('JSONL file version %s is not supported'
+                                     % record['version'])
+                continue
+            yield dict(('_%s' % key, value) for key, value in record.items())
+
+
+def load_games(filename):
+    """Generate game dicts from a file in either JSON or JSONL format."""
+    if is_jsonl(filename):
+        return load_jsonl(filename)
+    return iter(load_json(filename))
+
+
+def load_json(filename):
+    """Return a list of game dicts, as used by GameObject, from a JSON file.
+
+    Files without a schema version are in the original format, created from
+    each game's attributes; for these, the game dicts are returned as-is.
+    """
+    with open(filename) as json_file:
+        data = json.load(json_file, object_pairs_hook=OrderedDict)
+    if 'version' not in data:
+        return list(data.values())
+    if data['version'] > JSON_VERSION:
+        raise ValueError('JSON file version %s is not supported' %
+                         data['version'])
+    return [dict(('_%s' % key, value) for key, value in record.items())
+            for record in data['games'].values()]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Local, on-disc cache of game images sourced from the web, so that each
+    image is only downloaded once - rather than once per use, per report.
+Notes:
+    Files are named after a hash of their URL; when the cache grows beyond
+    its size limit, the least recently used files are removed.
+
+    Images can also be reduced to the resolution needed for the size at which
+    they are placed in a report, and re-encoded as JPEG; these processed
+    copies are stored in the same cache.
+"""
+# lib
+import hashlib
+import os
+import tempfile
+import threading
+# third party
+from PIL import Image as PILImage
+import requests
+# local
+from cache import CACHE_DIR
+from profiling import count, timed, timer
+
+IMAGE_DIR = os.path.join(CACHE_DIR, 'images')
+IMAGE_CACHE_SIZE = 500 * 1024 * 1024  # bytes
+IMAGE_DPI = 150  # resolution of images, at their placed size
+IMAGE_QUALITY = 75  # JPEG quality (1 to 95) of processed images
+
+
+def is_remote(path):
+    """Check if an image path is a web URL, rather than a file on disc."""
+    return path.startswith('http://') or path.startswith('https://')
+
+
+class ImageCache(object):
+    """Store of downloaded images, keyed on a hash of their URL."""
+
+    def __init__(self, cache_dir=None, max_size=IMAGE_CACHE_SIZE, timeout=30):
+        """
+        Args:
+            cache_dir: string
+                directory in which images are kept; default is
+                ~/.cache/gamereporter/images
+            max_size: int
+                no. of bytes the cache can hold before old images are removed
+            timeout: int
+                no. of seconds to wait for an image download
+        """
+        self.cache_dir = cache_dir or IMAGE_DIR
+        self.max_size = int(max_size)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.size = None  # calculated on first download
+        self.lock = threading.Lock()
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']  # not picklable; e.g. for use in another process
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def path_for(self, url):
+        """Return the name of the cache file for an image URL."""
+        ext = os.path.splitext(url.split('?')[0])[1][:5] or '.img'
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + ext)
+
+    def get(self, url):
+        """Return the path to a local copy of an image; download if needed.
+
+        Paths which are not web URLs are returned unchanged.  If an image
+        cannot be downloaded, its URL is returned instead.
+        """
+        if not is_remote(url):
+            return url
+        path = self.path_for(url)
+        if os.path.exists(path):
+            os.utime(path, None)  # mark as recently used
+            with self.lock:
+                self.hits += 1
+            return path
+        with self.lock:
+            self.misses += 1
+        try:
+            with timer('image download'):
+                response = requests.get(url, timeout=self.timeout)
+                response.raise_for_status()
+        except requests.exceptions.RequestException:
+            return url
+        count('image bytes downloaded', len(response.content))
+        # write to a temporary file first, so that a part-written image can
+        # never be mistaken for a cached one
+        handle, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(handle, 'wb') as tmp_file:
+            tmp_file.write(response.content)
+        os.rename(tmp_path, path)
+        self.added(len(response.content))
+        return path
+
+    @timed('image resample')
+    def processed(self, path, width, height, dpi=IMAGE_DPI,
+                  quality=IMAGE_QUALITY):
+        """Return the path to a copy of an image, resampled and saved as JPEG.
+
+        Args:
+            path: string
+                local path to the source image
+            width: float
+                width (in points) at which the image is placed
+            height: float
+                height (in points) at which the image is placed
+            dpi: int
+                resolution required at the placed size
+            quality: int
+                JPEG quality to save with
+
+        Images are never enlarged.  If the source is a JPEG no larger than
+        needed, or it cannot be processed, its path is returned unchanged.
+        """
+        size = (max(int(round(width * dpi / 72.0)), 1),
+                max(int(round(height * dpi / 72.0)), 1))
+        key = '%s|%dx%d|%d' % (path, size[0], size[1], quality)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        target = os.path.join(self.cache_dir, name + '.jpg')
+        if os.path.exists(target):
+            os.utime(target, None)
+            return target
+        try:
+            img = PILImage.open(path)
+            small = img.size[0] <= size[0] and img.size[1] <= size[1]
+            if small and img.format == 'JPEG':
+                return path
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = PILImage.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[-1])
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            if not small:
+                img = img.resize(size, PILImage.LANCZOS)
+            handle, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(handle, 'wb') as tmp_file:
+                img.save(tmp_file, 'JPEG', quality=int(quality), optimize=True)
+        except (IOError, ValueError):
+            return path
+        os.rename(tmp_path, target)
+        self.added(os.path.getsize(target))
+        return target
+
+    def added(self, nbytes):
+        """Record an addition to the cache; remove old images if it is full."""
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self.entries())
+            else:
+                self.size += nbytes
+            if self.size > self.max_size:
+                self.evict()
+
+    def entries(self):
+        """Return (last used, size, path) for all files in the cache."""
+        items = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            items.append((info.st_mtime, info.st_size, path))
+        return items
+
+    def evict(self):
+        """Remove least recently used images until the cache fits its limit."""
+        items = sorted(self.entries())
+        self.size = sum(size for _, size, _ in items)
+        for _, size, path in items:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                self.size -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        """Return a summary of cache usage for this run."""
+        return 'Image cache: %d hits, %d downloads (%s)' % (
+            self.hits, self.misses, self.cache_dir)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Layouts of the per-game tables in a PDF report (one per report style).
+Notes:
+    A layout - column widths, row heights, cell spans and table style - is
+    compiled once for a document width; creating the table for a game then
+    only needs the content of its cells.
+
+    Each layout function takes the document width and the report's
+    paragraph styles (used for the fonts of any plain-text cells).
+
+    A PagedTable lays out a long table one page at a time - each page is a
+    separate table, with its own header row - so that the rows for the rest
+    of the report are neither created nor measured again at each page break.
+"""
+# reportlab
+from reportlab.lib.colors import black, white, whitesmoke
+from reportlab.lib.fonts import ps2tt, tt2ps
+from reportlab.lib.units import cm
+from reportlab.platypus import Flowable, Table, TableStyle
+
+BASE_COMMANDS = [
+    ('BOX', (0, 0), (-1, -1), 0.5, black),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+]
+
+
+class TableLayout(object):
+    """Compiled layout for a table; used to create a table from cell data."""
+
+    def __init__(self, col_widths, commands, row_heights=None,
+                 image_width=None, image_height=None, repeat_rows=0):
+        """
+        Args:
+            col_widths: list
+                width of each column
+            commands: list
+                reportlab table style commands e.g. ('SPAN', (0, 0), (1, 0))
+            row_heights: list
+                height of each row; default is to size rows to fit
+            image_width: float
+                width at which a game's image is placed (if any)
+            image_height: float
+                height at which a game's image is placed (if any)
+            repeat_rows: int
+                no. of header rows to repeat when a table is split over pages
+        """
+        self.col_widths = col_widths
+        self.row_heights = row_heights
+        self.style = TableStyle(commands)
+        self.image_width = image_width
+        self.image_height = image_height
+        self.repeat_rows = repeat_rows
+
+    def table(self, data):
+        """Create a table from rows of cell data."""
+        table = Table(data, colWidths=self.col_widths,
+                      rowHeights=self.row_heights,
+                      repeatRows=self.repeat_rows)
+        table.setStyle(self.style)
+        return table
+
+
+class PagedTable(Flowable):
+    """Long table, with a header row on each page, created from an iterable
+    of rows as the pages are laid out."""
+
+    def __init__(self, layout, header, rows, page_rows=50):
+        """
+        Args:
+            layout: TableLayout
+                layout used for the table on each page
+            header: list
+                cells of the header row
+            rows: iterable
+                lists of cells; one list per row
+            page_rows: int
+                no. of rows to measure at first, when filling a page
+        """
+        Flowable.__init__(self)
+        self.layout = layout
+        self.header = header
+        self.rows = iter(rows)
+        self.pending = []  # rows taken from `rows`, but not yet laid out
+        self.page_rows = page_rows
+        self.table = None
+
+    def fill(self, count):
+        """Take rows, until `count` are pending; False if there are no more."""
+        while len(self.pending) < count:
+            try:
+                self.pending.append(next(self.rows))
+            except StopIteration:
+                return False
+        return True
+
+    def wrap(self, availWidth, availHeight):
+        # keep adding rows until they overflow the space (or run out), so
+        # that the frame splits this at the last row that fits
+        count = self.page_rows
+        while True:
+            more = self.fill(count)
+            self.table = self.layout.table([self.header] + self.pending)
+            width, height = self.table.wrap(availWidth, availHeight)
+            if height > availHeight or not more:
+                return width, height
+            count *= 2
+
+    def split(self, availWidth, availHeight):
+        if self.table is None:
+            self.wrap(availWidth, availHeight)
+        parts = self.table.split(availWidth, availHeight)
+        if not parts:
+            return []
+        done = parts[0]._nrows - 1  # rows on this page, less the header
+        rest = PagedTable(self.layout, self.header, self.rows, self.page_rows)
+        rest.pending = self.pending[done:]
+        return [parts[0], rest]
+
+    def draw(self):
+        self.table.drawOn(self.canv, 0, 0)
+
+
+def bold_font(name):
+    """Return the bold version of a font, as used for <b> in a Paragraph."""
+    try:
+        family, _, italic = ps2tt(name)
+        return tt2ps(family, 1, italic)
+    except ValueError:
+        return name
+
+
+def full_layout(width, styles):
+    """Layout for the full style; 8 columns, with description and image."""
+    div = width / 8.0
+    # note that 'n' in div * n MUST correspond to number of cols spanned
+    return TableLayout(
+        [div] * 8,
+        BASE_COMMANDS + [
+            ('SPAN', (0, 0), (1, 0)),
+            ('SPAN', (2, 0), (3, 0)),
+            ('SPAN', (4, 0), (5, 0)),
+            ('SPAN', (6, 0), (7, 0)),
+            ('SPAN', (0, 1), (7, 1)),
+            ('SPAN', (0, 2), (7, 2)),
+            ('SPAN', (0, 3), (4, 3)),
+            ('SPAN', (5, 3), (7, 3)),
+        ],
+        image_width=div * 3 - 9)
+
+
+def compact_layout(width, styles):
+    """Layout for the compact style; 7 columns in 3 fixed-height rows."""
+    div = width / 7.0
+    height = 0.6 * cm
+    # note that 'n' in div * n MUST correspond to number of cols spanned
+    return TableLayout(
+        [div] * 7,
+        BASE_COMMANDS + [
+            ('SPAN', (0, 0), (0, 2)),
+            ('SPAN', (1, 0), (3, 0)),
+            ('SPAN', (1, 1), (6, 1)),
+            ('SPAN', (1, 2), (6, 2)),
+        ],
+        row_heights=[height] * 3,
+        image_height=height * 3 - 8)
+
+
+def summary_layout(width, styles):
+    """Layout for the summary style; a header row, then a row per game, of 6
+    columns; the header is repeated at the top of each page.
+
+    Apart from the game's name, cells are plain text (in the bold version of
+    the 'left' style's font) as these are far quicker to lay out.
+    """
+    div = width / 7.0
+    body = styles['left']
+    return TableLayout(
+        [div * 2, div, div, div, div, div],
+        BASE_COMMANDS + [
+            ('FONT', (1, 1), (-1, -1), bold_font(body.fontName),
+             body.fontSize, body.leading),
+            ('TOPPADDING', (0, 1), (-1, -1), 1),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 2),
+            ('LINEBELOW', (0, 0), (-1, 0), 0.5, black),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [white, whitesmoke]),
+        ],
+        repeat_rows=1)
+
+
+LAYOUTS = {
+    'full': full_layout,
+    'compact': compact_layout,
+    'summary': summary_layout,
+}
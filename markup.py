@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Convert BGG markup - as used in game descriptions - into the markup used
+    by a reportlab Paragraph.
+Notes:
+    The text is read once, as a series of tokens - BGG tags (e.g. [b], [/b],
+    [url=...], [thing=...]) and entities - and the plain text between them.
+    Both the full text and a shortened version (cut at a word boundary) are
+    created in that one pass.
+
+    The result is always valid Paragraph markup: tags are only closed if they
+    are open, any left open are closed at the end, and unknown tags - or a
+    stray [ or ] - are shown as plain text.
+
+    For example, "[b]1830[/b] is a [thing=421]railway[/thing] game" becomes
+    '<b>1830</b> is a <a href="https://boardgamegeek.com/thing/421"
+    color="blue">railway</a> game'.
+"""
+# lib
+from htmlentitydefs import name2codepoint
+import re
+# reportlab
+from reportlab.lib.colors import toColor
+
+BGG_URL = 'https://boardgamegeek.com/%s/%s'
+# BGG tags shown as a reportlab tag
+STYLE_TAGS = {
+    'b': 'b',
+    'i': 'i',
+    'u': 'u',
+    '-': 'strike',
+    'q': 'i',
+}
+# BGG tags linking to an item on BGG, via its ID
+ITEM_TAGS = (
+    'thing', 'boardgame', 'boardgameexpansion', 'boardgamefamily',
+    'boardgamedesigner', 'boardgamepublisher', 'family', 'person', 'geeklist',
+)
+# BGG tags whose content is kept, but whose formatting is not
+IGNORED_TAGS = ('size', 'center', 'floatleft', 'floatright', 'o', 'c')
+ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;'}
+URL = re.compile(r'(https?://|mailto:)[^\s"<>]+$')
+COLOR = re.compile(r'#?[0-9A-Za-z]+$')
+TAG = re.compile(r'\[(/)?([a-zA-Z-]+)(?:=([^\]\n]*))?\]')
+URL_END = re.compile(r'\[/url\]', re.IGNORECASE)
+ENTITY = re.compile(r'&(#[0-9]{1,7}|#[xX][0-9a-fA-F]{1,6}|[a-zA-Z]+);')
+ELLIPSIS = u'...'
+
+
+def entity_text(name):
+    """Return the character for an HTML entity name; or None if unknown."""
+    try:
+        if name.startswith('#x') or name.startswith('#X'):
+            return unichr(int(name[2:], 16))
+        if name.startswith('#'):
+            return unichr(int(name[1:]))
+    except (ValueError, OverflowError):
+        return None
+    code = name2codepoint.get(name)
+    return unichr(code) if code else None
+
+
+def open_tag(tag, arg, text, end):
+    """
+    Return the reportlab tags which open & close a BGG tag; or None if the
+    tag is not known (or not valid) and so is shown as text.
+
+    Args:
+        tag: string
+            name of the BGG tag (in lower case)
+        arg: string
+            the tag's argument, after =, if any
+        text: string
+            the text being converted
+        end: int
+            position in the text just after the tag
+    """
+    if tag in STYLE_TAGS:
+        name = STYLE_TAGS[tag]
+        return '<%s>' % name, '</%s>' % name
+    if tag == 'url':
+        if arg is None:  # [url]link[/url]
+            close = URL_END.search(text, end)
+            arg = text[end:close.start()] if close else ''
+        arg = arg.strip().strip('"\'')
+        if not URL.match(arg):
+            return '', ''  # keep the text, without the link
+        return '<a href="%s" color="blue">' % arg.replace(
+            '&', '&amp;'), '</a>'
+    if tag in ITEM_TAGS:
+        if not arg or not arg.strip().isdigit():
+            return '', ''
+        return '<a href="%s" color="blue">' % (
+            BGG_URL % (tag, arg.strip())), '</a>'
+    if tag == 'color':
+        if not arg or not COLOR.match(arg.strip()):
+            return '', ''
+        try:
+            toColor(arg.strip())  # as a Paragraph will, e.g. for "blue"
+        except ValueError:
+            return '', ''
+        return '<font color="%s">' % arg.strip(), '</font>'
+    if tag in IGNORED_TAGS:
+        return '', ''
+    return None
+
+
+def token_starts(text):
+    """Yield the position of each [ or & - the start of a tag or entity - in
+    text, then its length."""
+    brace = text.find('[')
+    amp = text.find('&')
+    while brace >= 0 or amp >= 0:
+        if amp < 0 or 0 <= brace < amp:
+            yield brace
+            brace = text.find('[', brace + 1)
+        else:
+            yield amp
+            amp = text.find('&', amp + 1)
+    yield len(text)
+
+
+def escape_text(text):
+    """Return plain text (with no [ or &) as Paragraph markup."""
+    return text.replace('<', '&lt;').replace('>', '&gt;').replace(
+        '\n', '<br/>')
+
+
+def cut_point(text, length):
+    """Return the position at which to cut text to a length; moved back to
+    the space before the word at that point, if there is one."""
+    if len(text) <= length:
+        return len(text)
+    space = text.rfind(' ', 0, length + 1)
+    return space if space >= 0 else length
+
+
+def bgg_to_html(text, short=None):
+    """
+    Convert BGG markup to reportlab Paragraph markup.
+
+    Args:
+        text: string
+            text in BGG markup
+        short: int
+            no. of characters of text (not markup) in the shortened text;
+            None if it is not needed
+
+    Returns:
+        tuple of the full text and the shortened text (which ends with '...'
+        if it was cut); the shortened text is None if `short` is None
+    """
+    text = text or u''
+    out = []  # pieces of the full text
+    stack = []  # (BGG tag, closing reportlab tag) of open tags
+    budget = None if short is None else int(short)
+    shortened = None
+    pos = 0
+    length = len(text)
+    for start in token_starts(text):
+        if start < pos:  # part of a token already read, e.g. a tag's argument
+            continue
+        if start > pos:  # plain text before this token
+            piece = text[pos:start]
+            if budget is not None:
+                size = len(piece)
+                if size > budget:
+                    cut = cut_point(piece, max(budget, 0))
+                    shortened = ''.join(out) + \
+                        escape_text(piece[:cut].rstrip()) + ELLIPSIS + \
+                        ''.join(end for name, end in reversed(stack))
+                    budget = None
+                else:
+                    budget -= size
+            out.append(escape_text(piece))
+        if start == length:
+            break
+        pos = start + 1
+        if text[start] == '&':
+            entity = ENTITY.match(text, start)
+            if entity is None:
+                out.append('&amp;')
+            else:
+                pos = entity.end()
+                char = entity_text(entity.group(1))
+                if char is None:  # show as text, e.g. "R&D;"
+                    out.append('&amp;' + entity.group()[1:])
+                else:
+                    out.append(ESCAPES.get(char, char))
+            if budget is not None:
+                budget -= 1
+            continue
+        tag = TAG.match(text, start)
+        if tag is None:  # a stray [
+            out.append('[')
+            if budget is not None:
+                budget -= 1
+            continue
+        pos = tag.end()
+        close, name, arg = tag.groups()
+        name = name.lower()
+        if close:
+            if name in [item for item, end in stack]:
+                while stack:
+                    item, end = stack.pop()
+                    out.append(end)
+                    if item == name:
+                        break
+                continue
+        else:
+            tags = open_tag(name, arg, text, pos)
+            if tags is not None:
+                out.append(tags[0])
+                stack.append((name, tags[1]))
+                continue
+        # not a tag that can be used here; show it as text
+        out.append(escape_text(tag.group()))
+        if budget is not None:
+            budget -= len(tag.group())
+    out.extend(end for name, end in reversed(stack))
+    html = ''.join(out)
+    if short is not None and shortened is None:
+        shortened = html
+    return html, shortened
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Merge PDF files - e.g. the parts of a report laid out in parallel - into
+    a single PDF, with each page of an "overlay" PDF drawn on top of the
+    corresponding merged page (used for headers & footers).
+Notes:
+    Requires the PyPDF2 library; if that is not installed, PdfFileReader is
+    None.
+
+    An overlay page is added as a form XObject, with its own resources, plus
+    a short content stream that draws it; this is far faster than using
+    PyPDF2's `mergePage()`, which re-writes the content of both pages.
+"""
+# third party
+try:
+    from PyPDF2 import PdfFileReader, PdfFileWriter
+    from PyPDF2.generic import ArrayObject, DecodedStreamObject, \
+        DictionaryObject, NameObject
+except ImportError:
+    PdfFileReader = PdfFileWriter = None
+
+FORM_NAME = '/GRStamp'  # name of the overlay form in a page's resources
+
+
+def content_stream(writer, data):
+    """Add a content stream to a PDF writer; return a reference to it."""
+    stream = DecodedStreamObject()
+    stream.setData(data)
+    return writer._addObject(stream)
+
+
+def stamp_page(writer, page, overlay):
+    """Draw an overlay page on top of a page (both PageObjects)."""
+    contents = overlay.getContents()
+    form = DecodedStreamObject()
+    form.setData(contents.getData() if contents is not None else '')
+    form.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): overlay.mediaBox,
+        NameObject('/Resources'): overlay.get('/Resources', DictionaryObject()),
+    })
+    # copy resources, in case they are shared with other pages
+    resources = DictionaryObject(
+        page.get('/Resources', DictionaryObject()).getObject())
+    xobjects = DictionaryObject(
+        resources.get('/XObject', DictionaryObject()).getObject())
+    xobjects[NameObject(FORM_NAME)] = writer._addObject(form)
+    resources[NameObject('/XObject')] = xobjects
+    page[NameObject('/Resources')] = resources
+    # the page's own content is wrapped in q...Q so that any change it makes
+    # to the graphics state does not affect the overlay
+    original = page.get('/Contents')
+    if original is None:
+        original = []
+    elif isinstance(original.getObject(), ArrayObject):
+        original = list(original.getObject())
+    else:
+        original = [original]
+    page[NameObject('/Contents')] = ArrayObject(
+        [content_stream(writer, 'q\n')] + original +
+        [content_stream(writer, '\nQ q %s Do Q\n' % FORM_NAME)])
+
+
+def merge_pdfs(filenames, out_file, overlay_file=None):
+    """
+    Merge PDF files, in order, into one.
+
+    Args:
+        filenames: list
+            names of the PDF files to merge
+        out_file: file
+            file opened for (binary) writing
+        overlay_file: file
+            PDF (opened, or in a BytesIO) with one page per merged page, drawn
+            on top of that page
+    """
+    handles = [open(filename, 'rb') for filename in filenames]
+    try:
+        readers = [PdfFileReader(handle) for handle in handles]
+        overlay = PdfFileReader(overlay_file) if overlay_file else None
+        writer = PdfFileWriter()
+        number = 0
+        for reader in readers:
+            for num in range(reader.getNumPages()):
+                page = reader.getPage(num)
+                if overlay and number < overlay.getNumPages():
+                    stamp_page(writer, page, overlay.getPage(number))
+                writer.addPage(page)
+                number += 1
+        writer.write(out_file)
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def page_count(filenames):
+    """Return the total no. of pages in PDF files."""
+    total = 0
+    for filename in filenames:
+        with open(filename, 'rb') as handle:
+            total += PdfFileReader(handle).getNumPages()
+    return total
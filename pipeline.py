@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Pass games through a series of stages - e.g. retrieval from BGG, image
+    downloads, layout - so that each game moves on as soon as it is ready,
+    and all the stages run at the same time.
+Notes:
+    Each stage runs in its own thread and hands games on to the next stage
+    through a bounded queue; when a queue is full, the stage before it waits
+    (so a fast stage cannot run far ahead of a slow one, nor fill memory).
+    The last stage is whatever iterates over the pipeline, e.g. the layout
+    of a PDF.  Games keep their order.
+
+    Each stage counts the games it handles, and the time it spends working,
+    waiting for games from the stage before it, and waiting for room in the
+    queue to the next stage.  An error in any stage is raised where the
+    pipeline is being iterated over.
+
+    Example:
+
+    pipeline = Pipeline(bgg_games(user='shurelock', stream=True), 'fetch')
+    pipeline.add('images', download_image, workers=8)
+    for game in pipeline:
+        ...
+    print pipeline.stats()
+"""
+# lib
+from collections import deque
+from multiprocessing.pool import ThreadPool
+import Queue
+import sys
+import threading
+import time
+
+QUEUE_SIZE = 16  # max. no. of games waiting between two stages
+END = object()  # marks the end of the games
+
+
+class Failure(object):
+    """Error raised in a stage, passed on to be raised by the consumer."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.exc_info = sys.exc_info()
+
+
+class StageStats(object):
+    """Counts of games handled by one stage, and of where its time went."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0  # seconds working (summed over all workers)
+        self.starved = 0.0  # seconds waiting for the stage before
+        self.blocked = 0.0  # seconds waiting for room in the next queue
+        self.start = None
+        self.end = None
+
+    def elapsed(self):
+        """Return the no. of seconds from the stage's start to its end."""
+        if self.start is None:
+            return 0.0
+        return (self.end or time.time()) - self.start
+
+    def summary(self):
+        """Return a one-line summary of the stage's throughput."""
+        elapsed = self.elapsed()
+        rate = self.items / elapsed if elapsed else 0.0
+        return '%-8s %6d games %7.1f/s  busy %6.1fs  waiting for input' \
+            ' %6.1fs, for output %6.1fs' % (
+                self.name, self.items, rate, self.busy, self.starved,
+                self.blocked)
+
+
+class Pipeline(object):
+    """Games moved from a source, through stages, to the consumer."""
+
+    def __init__(self, source, name='source', consumer='consumer',
+                 maxsize=QUEUE_SIZE):
+        """
+        Args:
+            source: iterable
+                games, e.g. a generator which retrieves them from BGG
+            name: string
+                name of the source stage, as shown by `stats()`
+            consumer: string
+                name of the last stage; whatever iterates over the pipeline
+            maxsize: int
+                no. of games each queue between stages can hold
+        """
+        self.source = source
+        self.maxsize = maxsize
+        self.stages = [(StageStats(name), None, 1)]
+        self.consumer = StageStats(consumer)
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def add(self, name, func, workers=1):
+        """
+        Add a stage; func is called with each game and returns the game to
+        pass on (or None to drop it).  With more than one worker, games are
+        handled concurrently but still passed on in order.
+        """
+        self.stages.append((StageStats(name), func, max(int(workers), 1)))
+        return self
+
+    def put(self, stats, queue, item):
+        """Put an item in a queue, waiting for room; False if stopped."""
+        start = time.time()
+        while not self.stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                stats.blocked += time.time() - start
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def run_source(self, stats, outbox):
+        """Take games from the source; run in a thread."""
+        stats.start = time.time()
+        try:
+            games = iter(self.source)
+            while not self.stopped.is_set():
+                start = time.time()
+                game = next(games, END)
+                stats.busy += time.time() - start
+                if game is END:
+                    break
+                stats.items += 1
+                if not self.put(stats, outbox, game):
+                    return
+        except Exception:
+            self.put(stats, outbox, Failure(stats.name))
+            return
+        finally:
+            stats.end = time.time()
+        self.put(stats, outbox, END)
+
+    def run_stage(self, stats, func, workers, inbox, outbox):
+        """Pass each game from inbox through func, to outbox; run in a
+        thread."""
+        lock = threading.Lock()
+
+        def timed(game):
+            start = time.time()
+            try:
+                return func(game)
+            finally:
+                with lock:
+                    stats.busy += time.time() - start
+
+        def emit(game):
+            if game is None:  # dropped
+                return True
+            stats.items += 1
+            return self.put(stats, outbox, game)
+
+        pool = ThreadPool(workers) if workers > 1 else None
+        pending = deque()  # results of games being handled by the pool
+        stats.start = time.time()
+        try:
+            while not self.stopped.is_set():
+                start = time.time()
+                try:
+                    game = inbox.get(timeout=0.1)
+                except Queue.Empty:
+                    stats.starved += time.time() - start
+                    continue
+                stats.starved += time.time() - start
+                if game is END or isinstance(game, Failure):
+                    while pending:
+                        if not emit(pending.popleft().get()):
+                            return
+                    self.put(stats, outbox, game)
+                    return
+                if pool:
+                    pending.append(pool.apply_async(timed, (game, )))
+                    if len(pending) >= workers and \
+                            not emit(pending.popleft().get()):
+                        return
+                elif not emit(timed(game)):
+                    return
+        except Exception:
+            self.put(stats, outbox, Failure(stats.name))
+        finally:
+            stats.end = time.time()
+            if pool:
+                pool.terminate()
+
+    def start(self):
+        """Start a thread for each stage; return the queue of the last."""
+        queue = Queue.Queue(self.maxsize)
+        stats = self.stages[0][0]
+        self.threads = [threading.Thread(
+            target=self.run_source, args=(stats, queue))]
+        for stats, func, workers in self.stages[1:]:
+            inbox, queue = queue, Queue.Queue(self.maxsize)
+            self.threads.append(threading.Thread(
+                target=self.run_stage,
+                args=(stats, func, workers, inbox, queue)))
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+        return queue
+
+    def stop(self):
+        """Stop all the stages, e.g. when the consumer has finished."""
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def __iter__(self):
+        queue = self.start()
+        stats = self.consumer
+        stats.start = time.time()
+        try:
+            while True:
+                start = time.time()
+                game = queue.get()
+                stats.starved += time.time() - start
+                if game is END:
+                    break
+                if isinstance(game, Failure):
+                    raise game.exc_info[0], game.exc_info[1], \
+                        game.exc_info[2]
+                stats.items += 1
+                start = time.time()
+                yield game
+                stats.busy += time.time() - start
+        finally:
+            stats.end = time.time()
+            self.stop()
+
+    def stats(self):
+        """Return a summary of each stage's throughput."""
+        return '\n'.join(['Pipeline:'] + [
+            '  ' + stats.summary() for stats, func, workers in self.stages] +
+            ['  ' + self.consumer.summary()])
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Timers and counters for the slow parts of creating a report - e.g. BGG
+    requests, image downloads, font loading and PDF layout - so a slow run
+    can be explained.
+Notes:
+    All timings are kept by one, process-wide, Profiler; any thread can add
+    to it.  A timer records the number of calls, and the total and longest
+    time taken; timers can be nested (e.g. "doc.build" includes the time of
+    each "create_table" call made while the document is laid out) and, when
+    run in many threads at once, can add up to more than the run took.
+
+    Work done in other processes - e.g. with `--render-workers`, or when
+    creating several styles at once - is not included.
+
+    `profile_call()` runs cProfile in every thread started during a call -
+    e.g. those retrieving games and downloading images - and saves their
+    combined statistics.
+
+    Example:
+
+    @timed('fetch_games')
+    def fetch_games(bgg, ids):
+        ...
+
+    with timer('doc.build'):
+        doc.build(elements)
+    count('pages', doc.page)
+    print profiler.report()
+"""
+# lib
+from contextlib import contextmanager
+import cProfile
+from functools import wraps
+import json
+import pstats
+import threading
+import time
+
+
+class Timing(object):
+    """Number of calls of one timer, and the time they took."""
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0  # seconds
+        self.longest = 0.0  # seconds
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.longest = max(self.longest, seconds)
+
+    def as_dict(self):
+        return {'calls': self.calls, 'total': self.total,
+                'longest': self.longest}
+
+
+class Profiler(object):
+    """Timings and counts of named parts of a run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all timings and counts; the run starts now."""
+        with self.lock:
+            self.timings = {}  # name -> Timing
+            self.counters = {}  # name -> number
+            self.start = time.time()
+
+    def add(self, name, seconds):
+        """Record one call of a timer."""
+        with self.lock:
+            if name not in self.timings:
+                self.timings[name] = Timing()
+            self.timings[name].add(seconds)
+
+    def count(self, name, number=1):
+        """Add to a counter."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + number
+
+    @contextmanager
+    def timer(self, name):
+        """Time the code in a `with` block."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start)
+
+    def timed(self, name):
+        """Decorator which times every call of a function."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.time()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(name, time.time() - start)
+            return wrapper
+        return decorator
+
+    def as_dict(self):
+        """Return all timings and counts, e.g. to be saved as JSON."""
+        with self.lock:
+            return {
+                'elapsed': time.time() - self.start,
+                'timings': dict((name, timing.as_dict())
+                                for name, timing in self.timings.items()),
+                'counters': dict(self.counters),
+            }
+
+    def save(self, filename):
+        """Save all timings and counts in a JSON file."""
+        with open(filename, 'w') as _file:
+            json.dump(self.as_dict(), _file, indent=2, sort_keys=True,
+                      separators=(',', ': '))
+
+    def report(self):
+        """Return a table of the timers, longest total first, and counters."""
+        data = self.as_dict()
+        elapsed = data['elapsed']
+        lines = ['Profile of %.1f seconds:' % elapsed,
+                 '  %-24s %7s %10s %10s %10s %7s' % (
+                     'Timer', 'Calls', 'Total (s)', 'Mean (ms)', 'Max (ms)',
+                     '% run')]
+        timings = sorted(data['timings'].items(),
+                         key=lambda item: -item[1]['total'])
+        for name, timing in timings:
+            lines.append('  %-24s %7d %10.2f %10.1f %10.1f %7.1f' % (
+                name, timing['calls'], timing['total'],
+                1000 * timing['total'] / timing['calls'],
+                1000 * timing['longest'],
+                100 * timing['total'] / elapsed if elapsed else 0.0))
+        if data['counters']:
+            lines.append('  %-24s %7s' % ('Counter', 'Count'))
+            for name, number in sorted(data['counters'].items()):
+                lines.append('  %-24s %7d' % (name, number))
+        return '\n'.join(lines)
+
+
+def profile_call(filename, func, *args, **kwargs):
+    """
+    Call func with args, with cProfile running in this thread and in every
+    thread started during the call; save the combined statistics to a file
+    (which can be read with the pstats module).
+    """
+    profiles = []
+    lock = threading.Lock()
+
+    def start_thread(frame, event, arg):
+        # called for the first event in each new thread; the profile then
+        # takes over from this function
+        profile = cProfile.Profile()
+        with lock:
+            profiles.append(profile)
+        profile.enable()
+
+    main = cProfile.Profile()
+    threading.setprofile(start_thread)
+    try:
+        return main.runcall(func, *args, **kwargs)
+    finally:
+        threading.setprofile(None)
+        stats = pstats.Stats(main)
+        with lock:
+            for profile in profiles:
+                stats.add(profile)
+        stats.dump_stats(filename)
+
+
+profiler = Profiler()  # shared by everything in this process
+timer = profiler.timer
+timed = profiler.timed
+count = profiler.count
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Select and order the games used for a report.
+Notes:
+    Conditions are written as FIELD, or FIELD followed by an operator and a
+    value; for example: owned  plays>0  players>=4  weight<2.5
+
+    Conditions on a user's collection (e.g. owned, rated, plays) are checked
+    against the collection listing, so that details are never retrieved for
+    games that will be dropped.  All other conditions are checked against
+    each game's details.
+"""
+# lib
+import re
+# local
+from bgg import BGGGameList
+
+OPERATORS = ('<=', '>=', '!=', '==', '<', '>', '=')
+# prefixes of a sort field for descending order; "-" can only be given to
+# argparse as e.g. --sort=-rating
+DESCENDING = ('-', '~', 'desc:')
+CONDITION = re.compile(r'^\s*(!?)([a-z_]+)\s*(?:(%s)\s*(\S+))?\s*$' %
+                       '|'.join([re.escape(op) for op in OPERATORS]))
+# conditions which can be checked against a user's collection listing
+COLLECTION_FIELDS = {
+    'owned': 'own',
+    'rated': 'rating',
+    'rating': 'rating',
+    'plays': 'numplays',
+    'wishlist': 'wishlist',
+    'fortrade': 'fortrade',
+    'want': 'want',
+    'wanttoplay': 'wanttoplay',
+    'wanttobuy': 'wanttobuy',
+    'prevowned': 'prevowned',
+    'preordered': 'preordered',
+}
+# BGG collection API parameters which can be used to do the selection there
+COLLECTION_PARAMS = {
+    ('owned', None): ('own', 1),
+    ('rated', None): ('rated', 1),
+    ('plays', '>'): ('played', 1),  # only for a value of 0 or more
+    ('wishlist', None): ('wishlist', 1),
+    ('fortrade', None): ('trade', 1),
+}
+# short names for game fields
+ALIASES = {
+    'weight': 'averageweight',
+    'year': 'yearpublished',
+    'time': 'playingtime',
+    'age': 'minage',
+}
+
+
+def compare(left, operator, right):
+    """Compare two values with an operator given as a string."""
+    if left is None:
+        return False
+    if operator == '<':
+        return left < right
+    if operator == '<=':
+        return left <= right
+    if operator == '>':
+        return left > right
+    if operator == '>=':
+        return left >= right
+    if operator == '!=':
+        return left != right
+    return left == right
+
+
+def to_number(value):
+    """Convert a value to a float; None if that is not possible."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Condition(object):
+    """A single condition on a game; e.g. 'owned' or 'weight<2.5'"""
+
+    def __init__(self, text):
+        match = CONDITION.match(text.lower())
+        if not match:
+            raise ValueError('Unable to understand the condition "%s"' % text)
+        negate, field, operator, value = match.groups()
+        self.text = text
+        self.negate = bool(negate)
+        self.field = field
+        self.operator = '==' if operator == '=' else operator
+        if value is not None:
+            self.value = to_number(value)
+            if self.value is None:
+                raise ValueError('The value in "%s" must be a number' % text)
+        else:
+            self.value = None
+        self.collection = field in COLLECTION_FIELDS
+        if not self.collection:
+            field = ALIASES.get(field, field)
+            if field != 'players' and \
+                    field not in BGGGameList.NUMERIC_FIELDS:
+                raise ValueError('The field in "%s" is not known' % text)
+            if self.operator is None:
+                raise ValueError('The condition "%s" needs a value' % text)
+            self.field = field
+
+    def collection_param(self):
+        """Return the BGG collection API (name, value) for this condition."""
+        if self.negate:
+            return None
+        if self.value is not None and self.value < 0:  # e.g. plays>-1
+            return None
+        return COLLECTION_PARAMS.get((self.field, self.operator))
+
+    def check(self, value):
+        """Check a (raw) value against this condition."""
+        if self.operator is None:
+            result = bool(to_number(value))
+        else:
+            result = compare(to_number(value), self.operator, self.value)
+        return not result if self.negate else result
+
+    def check_item(self, item):
+        """Check a game in a user's collection listing."""
+        data = item.data()
+        if self.field == 'rated':
+            return self.check(1 if data.get('rating') is not None else 0)
+        return self.check(data.get(COLLECTION_FIELDS[self.field]))
+
+    def check_game(self, game):
+        """Check a game's details."""
+        if self.field == 'players':
+            low = to_number(getattr(game, '_minplayers', None))
+            high = to_number(getattr(game, '_maxplayers', None))
+            if self.operator in ('>', '>='):
+                result = compare(high, self.operator, self.value)
+            elif self.operator in ('<', '<='):
+                result = compare(low, self.operator, self.value)
+            elif low is None or high is None:
+                result = False
+            else:
+                result = low <= self.value <= high
+                if self.operator == '!=':
+                    result = not result
+            return not result if self.negate else result
+        value = getattr(game, '_%s' % self.field, None)
+        if value is None:
+            value = getattr(game, self.field, None)
+        return self.check(value)
+
+
+class GameQuery(object):
+    """Conditions (and an order) for selecting the games in a report."""
+
+    def __init__(self, conditions=None, sort=None):
+        """
+        Args:
+            conditions: list
+                strings; each a condition that a game must meet
+            sort: string
+                field to sort games on; prefix with - (or ~ or desc:) for
+                descending order
+        """
+        self.conditions = [Condition(text) for text in conditions or []]
+        self.reverse = False
+        self.sort = sort.strip().lower() if sort else None
+        for prefix in DESCENDING:
+            if self.sort and self.sort.startswith(prefix):
+                self.reverse = True
+                self.sort = self.sort[len(prefix):]
+                break
+        if self.sort and self.sort not in COLLECTION_FIELDS:
+            self.sort = ALIASES.get(self.sort, self.sort)
+            if self.sort not in BGGGameList.NUMERIC_FIELDS:
+                raise ValueError('Unable to sort on "%s"' % sort)
+
+    def __nonzero__(self):
+        return bool(self.conditions or self.sort)
+
+    @property
+    def has_collection_conditions(self):
+        """True if any condition is checked against a collection listing."""
+        return any(condition.collection for condition in self.conditions)
+
+    @property
+    def sorts_collection(self):
+        """True if the sort can be done on the collection listing."""
+        return self.sort in COLLECTION_FIELDS
+
+    @property
+    def needs_all(self):
+        """True if all games must be retrieved before they can be sorted."""
+        return bool(self.sort) and not self.sorts_collection
+
+    def collection_params(self):
+        """Return BGG collection API parameters that narrow the listing."""
+        params = {}
+        for condition in self.conditions:
+            if condition.collection:
+                param = condition.collection_param()
+                if param:
+                    params[param[0]] = param[1]
+        return params
+
+    def select_ids(self, collection):
+        """Return IDs of games in a collection that meet the conditions.
+
+        IDs are in the order of the listing, unless the sort is on a field
+        of the listing.
+        """
+        checks = [condition for condition in self.conditions
+                  if condition.collection]
+        items = [item for item in collection
+                 if all(check.check_item(item) for check in checks)]
+        if self.sorts_collection:
+            field = COLLECTION_FIELDS[self.sort]
+            known = [item for item in items
+                     if to_number(item.data().get(field)) is not None]
+            known.sort(key=lambda item: to_number(item.data().get(field)),
+                       reverse=self.reverse)
+            sorted_ids = set(item.id for item in known)
+            items = known + [item for item in items
+                             if item.id not in sorted_ids]
+        return [item.id for item in items]
+
+    def accepts(self, game):
+        """Check a game's details against the (non-collection) conditions."""
+        for condition in self.conditions:
+            if not condition.collection and not condition.check_game(game):
+                return False
+        return True
+
+    def sort_games(self, games):
+        """Return games sorted on a game field; games with no value last."""
+        if not self.needs_all:
+            return games
+        return list(BGGGameList(games).sort(self.sort, reverse=self.reverse))
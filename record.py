@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Compact record of a game's details, shared by all game-like objects used
+    by GameReportBuilder.
+Notes:
+    Only the raw values (with a _ prefix, e.g. `_averageweight`) are stored;
+    the string formatted versions (e.g. `averageweight`) are created when
+    they are accessed.  Descriptions converted to HTML - by far the largest
+    of these - are only created if used, e.g. for a `full` report, and are
+    then kept with the game.
+"""
+# future
+from __future__ import division
+# lib
+import math
+# local
+from markup import bgg_to_html
+
+RAW_FIELDS = (
+    'id', 'name', 'alternative_names', 'yearpublished', 'description',
+    'description_short', 'image', 'thumbnail', 'minplayers', 'maxplayers',
+    'playingtime', 'minage', 'averageweight', 'average', 'bayesaverage',
+    'median', 'stddev', 'ranks', 'usersrated', 'numcomments', 'numweights',
+    'owned', 'trading', 'wanting', 'wishing', 'categories', 'mechanics',
+    'families', 'designers', 'artists', 'publishers', 'implementations',
+    'expansion', 'expands', 'expansions',
+)
+
+
+def formatted(field, fmt='%s'):
+    """Property giving a raw field's value as a formatted string."""
+    def getter(self):
+        value = getattr(self, field)
+        if value is None:
+            return ''
+        return fmt % value
+    return property(getter)
+
+
+def joined(field):
+    """Property giving a raw field's list of values as a string."""
+    def getter(self):
+        return ', '.join(getattr(self, field) or [])
+    return property(getter)
+
+
+def joined_names(field):
+    """Property giving the names in a raw field's list of games as a string."""
+    def getter(self):
+        things = getattr(self, field) or []
+        return ', '.join([thing['name'] for thing in things])
+    return property(getter)
+
+
+def thing_dict(thing):
+    """Return a game in a list of expansions as a dict (id and name)."""
+    if isinstance(thing, dict):
+        return {'id': thing.get('id'), 'name': thing.get('name', '')}
+    return {'id': thing.id, 'name': thing.name}
+
+
+STATE_SLOTS = tuple('_%s' % field for field in RAW_FIELDS) + ('short', )
+
+
+class GameRecord(object):
+    """Raw details of a game, with string formatted versions on demand."""
+
+    # `markup` holds descriptions converted to HTML; see `description_markup`
+    __slots__ = STATE_SLOTS + ('markup', )
+
+    def __init__(self, short=500, **values):
+        """
+        Args:
+            short: int
+                number of characters to use for short description
+            values: dict
+                raw values keyed on field name (no _ prefix); see RAW_FIELDS
+        """
+        self.short = int(short) or 500
+        self.markup = None
+        for field in RAW_FIELDS:
+            setattr(self, '_%s' % field, values.get(field))
+        self._expands = [thing_dict(exp) for exp in self._expands or []]
+        self._expansions = [thing_dict(exp) for exp in self._expansions or []]
+
+    def __getstate__(self):
+        return dict((slot, getattr(self, slot)) for slot in STATE_SLOTS)
+
+    def __setstate__(self, state):
+        self.markup = None
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def HTML_description(self, text):
+        """Changes the BGG [] notation to <> and adds line breaks"""
+        return bgg_to_html(text)[0]
+
+    def get_description_custom(self):
+        """Create a custom, abbreviated description (as HTML) for a game."""
+        return self.description_markup('_description', self.short)[1]
+
+    def description_markup(self, field, short=None):
+        """
+        Return a description field as HTML, and shortened to `short`
+        characters (or None); converted when first needed, then kept for as
+        long as the field is unchanged.
+        """
+        text = getattr(self, field)
+        if self.markup is None:
+            self.markup = {}
+        entry = self.markup.get(field)
+        if entry is None or entry[0] is not text or entry[1] != short:
+            entry = (text, short) + bgg_to_html(text, short)
+            self.markup[field] = entry
+        return entry[2], entry[3]
+
+    alternative_names = joined('_alternative_names')
+    artists = joined('_artists')
+    average = formatted('_average', '%.3f')
+    averageweight = formatted('_averageweight', '%.2f')
+    bayesaverage = formatted('_bayesaverage', '%.3f')
+    categories = joined('_categories')
+    description = formatted('_description')
+    description_short = formatted('_description_short')
+    designers = joined('_designers')
+    expands = joined_names('_expands')
+    expansions = joined_names('_expansions')
+    families = joined('_families')
+    id = formatted('_id')
+    image = formatted('_image')
+    implementations = joined('_implementations')
+    maxplayers = formatted('_maxplayers')
+    mechanics = joined('_mechanics')
+    median = formatted('_median', '%.3f')
+    minage = formatted('_minage')
+    minplayers = formatted('_minplayers')
+    name = formatted('_name')
+    numcomments = formatted('_numcomments')
+    numweights = formatted('_numweights')
+    owned = formatted('_owned')
+    playingtime = formatted('_playingtime')
+    publishers = joined('_publishers')
+    ranks = formatted('_ranks')
+    stddev = formatted('_stddev', '%.3f')
+    thumbnail = formatted('_thumbnail')
+    trading = formatted('_trading')
+    usersrated = formatted('_usersrated')
+    wanting = formatted('_wanting')
+    wishing = formatted('_wishing')
+    yearpublished = formatted('_yearpublished')
+
+    @property
+    def percentageweight(self):
+        if self._averageweight is None:
+            return ''
+        return '%s' % math.ceil(self._averageweight * 20.0)
+
+    @property
+    def expansion(self):
+        if self._expansion is True:
+            return 'Yes'
+        return 'No'
+
+    @property
+    def description_html(self):
+        return self.description_markup('_description', self.short)[0]
+
+    @property
+    def description_short_html(self):
+        return self.description_markup('_description_short')[0]
+
+    @property
+    def description_custom(self):
+        return self.get_description_custom()
+
+    @property
+    def _description_custom(self):
+        return self.get_description_custom()
+
+    @property
+    def _rank(self):
+        for rank in self._ranks or []:
+            if rank.get('name') == 'boardgame':
+                return rank.get('value')
+        return None
+
+    @property
+    def rank(self):
+        if self._rank is None:
+            return ''
+        return '%s' % self._rank
+
+    @property
+    def players(self):
+        if self._minplayers == self._maxplayers:
+            return '%s' % self._maxplayers
+        return '%s-%s' % (self._minplayers, self._maxplayers)
+
+    @property
+    def _players(self):
+        return (self._minplayers, self._maxplayers)
+
+    @property
+    def age(self):
+        return '%s+' % self._minage
+
+    @property
+    def _age(self):
+        return self._minage
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Persistent cache of the laid-out (wrapped) paragraphs of each game's
+    table in a PDF report, so that an unchanged game is not laid out again on
+    the next run.
+Notes:
+    Entries are keyed on a hash of everything that affects the layout: the
+    text and paragraph style of each cell, the report style, page size and
+    document width, and the font files used.  Entries not used for
+    RENDER_TTL seconds are removed by `purge()`; this is done when the
+    database is first opened, so a run that lays out no tables (e.g. for a
+    spreadsheet) never opens it.
+
+    Wrapping a paragraph (breaking its text into lines) is the slow part of
+    laying out a table; a CachedParagraph keeps the lines for the width at
+    which it was last wrapped, so re-wrapping it at that width - e.g. when
+    its table is drawn, or split over pages - is free.
+"""
+# lib
+import cPickle as pickle
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+# reportlab
+from reportlab import Version
+from reportlab.pdfbase import pdfmetrics
+from reportlab.platypus import Paragraph
+# local
+from cache import CACHE_DIR
+
+RENDER_DB = 'render.sqlite'
+RENDER_TTL = 30 * 24 * 60 * 60  # seconds
+RENDER_VERSION = 1  # change when the stored layout changes
+SAVE_EVERY = 50  # no. of new entries written to the database at a time
+# paragraph style attributes which affect how text is wrapped
+STYLE_FIELDS = (
+    'fontName', 'fontSize', 'leading', 'alignment', 'leftIndent',
+    'rightIndent', 'firstLineIndent', 'wordWrap', 'spaceBefore', 'spaceAfter',
+    'autoLeading',
+)
+
+
+class CachedParagraph(Paragraph):
+    """Paragraph which keeps its lines, for the width it was wrapped at."""
+
+    def __init__(self, text, style, **kwargs):
+        Paragraph.__init__(self, text, style, **kwargs)
+        self.wrapped_at = None
+        self.entry = None  # RenderEntry to notify when first wrapped
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('canv', None)  # set during wrapOn()
+        # the style is part of a cache key; it is restored when an entry is
+        # loaded (see `RenderCache.paragraphs()`)
+        state['style'] = None
+        state['entry'] = None
+        return state
+
+    def wrap(self, availWidth, availHeight):
+        if self.wrapped_at == availWidth and hasattr(self, 'blPara'):
+            return self.width, self.height
+        size = Paragraph.wrap(self, availWidth, availHeight)
+        self.wrapped_at = availWidth
+        if self.entry:
+            self.entry.wrapped(self)
+        return size
+
+
+class RenderEntry(object):
+    """New paragraphs for one cache key; saved once they are all wrapped."""
+
+    def __init__(self, cache, key, paragraphs):
+        self.cache = cache
+        self.key = key
+        self.paragraphs = paragraphs
+        self.pending = set(id(para) for para in paragraphs)
+        for para in paragraphs:
+            para.entry = self
+
+    def wrapped(self, para):
+        self.pending.discard(id(para))
+        if not self.pending:
+            for item in self.paragraphs:
+                item.entry = None
+            self.cache.set(self.key, self.paragraphs)
+
+
+def style_signature(style):
+    """Return the values of a paragraph style that affect its layout."""
+    return tuple(getattr(style, field, None) for field in STYLE_FIELDS)
+
+
+def font_signature():
+    """Return the name, file & file size of every TrueType font registered."""
+    fonts = []
+    for name in sorted(pdfmetrics.getRegisteredFontNames()):
+        filename = getattr(pdfmetrics.getFont(name).face, 'filename', None)
+        if filename and os.path.exists(filename):
+            fonts.append((name, filename, os.path.getsize(filename)))
+    return tuple(fonts)
+
+
+def render_key(*parts):
+    """Return a hash (hex string) of the repr of some values."""
+    return hashlib.sha1(repr((RENDER_VERSION, Version) + parts)).hexdigest()
+
+
+class RenderCache(object):
+    """Store of wrapped paragraphs, keyed on a hash of what they depend on.
+
+    A cache can be shared between threads; access to it is serialised.  A
+    copy passed to another process opens its own database connection.
+    """
+
+    def __init__(self, cache_dir=None, ttl=RENDER_TTL):
+        """
+        Args:
+            cache_dir: string
+                directory in which the cache database is kept; default is
+                ~/.cache/gamereporter
+            ttl: int
+                no. of seconds an unused entry is kept for
+        """
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.ttl = int(ttl)
+        self.hits = 0
+        self.misses = 0
+        self.unsaved = []  # new entries, not yet written to the database
+        self.lock = threading.RLock()
+        self.db = None
+        self.purge_on_open = True
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # not picklable; e.g. for use in another process
+        del state['lock']
+        state['db'] = None
+        state['unsaved'] = []
+        state['purge_on_open'] = False  # left to the original
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def connect(self):
+        """Return the connection to the cache database; open it if needed."""
+        if self.db is None:
+            self.db = sqlite3.connect(
+                os.path.join(self.cache_dir, RENDER_DB), timeout=30,
+                check_same_thread=False)
+            # entries are saved by many processes at once
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS blocks ('
+                ' key TEXT PRIMARY KEY, data BLOB, used REAL)')
+            self.db.commit()
+            if self.purge_on_open:
+                self.purge_on_open = False
+                self.purge()
+        return self.db
+
+    def get(self, key):
+        """Return the list of paragraphs stored for a key; or None."""
+        with self.lock:
+            db = self.connect()
+            row = db.execute('SELECT data, used FROM blocks WHERE key = ?',
+                             (key, )).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if row[1] < now - 24 * 60 * 60:  # only mark as used once a day
+                db.execute('UPDATE blocks SET used = ? WHERE key = ?',
+                           (now, key))
+                db.commit()
+            self.hits += 1
+        return pickle.loads(zlib.decompress(str(row[0])))
+
+    def set(self, key, paragraphs):
+        """
+        Store a list of (wrapped) paragraphs for a key; new entries are
+        written to the database in groups (see `flush()`).
+        """
+        data = zlib.compress(pickle.dumps(paragraphs, 2))
+        with self.lock:
+            self.unsaved.append((key, sqlite3.Binary(data), time.time()))
+            if len(self.unsaved) >= SAVE_EVERY:
+                self.flush()
+
+    def flush(self):
+        """Write any new entries to the database."""
+        with self.lock:
+            if self.unsaved:
+                db = self.connect()
+                db.executemany(
+                    'INSERT OR REPLACE INTO blocks (key, data, used)'
+                    ' VALUES (?, ?, ?)', self.unsaved)
+                db.commit()
+                self.unsaved = []
+
+    def paragraphs(self, key, cells):
+        """
+        Return paragraphs for a list of (text, style) cells; from the cache
+        if they are stored for the key, otherwise new ones, which are saved
+        to the cache once they have all been wrapped.
+        """
+        found = self.get(key)
+        if found is not None and len(found) == len(cells):
+            for para, (text, style) in zip(found, cells):
+                para.style = style
+            return found
+        paragraphs = [CachedParagraph(text, style) for text, style in cells]
+        RenderEntry(self, key, paragraphs)
+        return paragraphs
+
+    def purge(self):
+        """Remove all entries not used within the ttl; return the number."""
+        with self.lock:
+            db = self.connect()
+            cursor = db.execute('DELETE FROM blocks WHERE used <= ?',
+                                (time.time() - self.ttl, ))
+            db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        """Return a summary of cache usage for this run."""
+        return 'Render cache: %d hits, %d misses (%s)' % (
+            self.hits, self.misses, self.cache_dir)
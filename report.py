@@ -6,15 +6,28 @@ Purpose:
     Demonstrate use of GameReportBuilder module
 """
 import argparse
+from itertools import chain
+import os
 import sys
-from bgg import bgg_games
+from bgg import bgg_client, bgg_games
+from cache import GameCache, MemoryCache, CACHE_DIR
+from images import ImageCache
+from profiling import profile_call, profiler
+from rendercache import RenderCache
+from query import GameQuery
+from sync import CollectionSync
+from throttle import TokenBucket
 from boardgamegeek.exceptions import BoardGameGeekAPIError
-from report_builder import GameReportBuilder
+from requests.exceptions import RequestException
+from report_builder import GameReportBuilder, sheet_columns
 from dummy.game import get_games  # dummy game examples
 
+BGG_ERROR = "Sorry - there was a problem accessing BGG" \
+    " (also check your game ID's)"
 
-def parse_args():
-    """Create the parser & parse args"""
+
+def create_parser():
+    """Create the parser"""
     parser = argparse.ArgumentParser(
         description='Create a PDF for games from boardgamegeek.com (BGG)')
     parser.add_argument('-u', '--user',
@@ -30,21 +43,142 @@ def parse_args():
                         help='Show progress of access to games from BGG')
     parser.add_argument(
         '-s', '--style',
-        help='Print according to a style [summary | compact | full | excel]')
+        help='Print according to a style'
+             ' [summary | compact | full | excel | xlsx | json | jsonl];'
+             ' or several, separated by commas e.g. full,excel,json')
     parser.add_argument('-i', '--input',
-                        help='Name of input JSON file')
+                        help='Name of input JSON (or .jsonl) file')
     parser.add_argument('-f', '--file',
-                        help='Name of output file (default: games.pdf/xls/json)')
+                        help='Name of output file'
+                             ' (default: games.pdf/xls/xlsx/json/jsonl)')
     parser.add_argument('-z', '--zone',
                         help='Use US to get USA date/times and paper-sizes')
     parser.add_argument('-c', '--count',
                         help='Number of games to retrieve (default: 10)')
     parser.add_argument('-g', '--games', nargs='+',
                         help='List of game IDs (ignored if user is supplied)')
-    return parser.parse_args()
+    parser.add_argument('--batch-size', type=int, default=20,
+                        help='Number of games to retrieve per BGG request'
+                             ' (default: 20)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help='Directory for the game and image caches'
+                             ' (default: %s)' % CACHE_DIR)
+    parser.add_argument('--cache-ttl', type=float, default=24,
+                        help='Hours before a cached game is retrieved again'
+                             ' from BGG; 0 to disable the cache (default: 24)')
+    parser.add_argument('--image-dpi', type=int, default=150,
+                        help='Resolution of images in a PDF; 0 to use the'
+                             ' original images (default: 150)')
+    parser.add_argument('--image-quality', type=int, default=75,
+                        help='JPEG quality (1-95) of images in a PDF'
+                             ' (default: 75)')
+    parser.add_argument('--sync', action='store_true',
+                        help='Only retrieve games added to, or changed in, a'
+                             ' user\'s collection since the last --sync run')
+    parser.add_argument('--json-compact', action='store_true',
+                        help='Write JSON output without indentation')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Number of concurrent requests to BGG'
+                             ' (default: 4)')
+    parser.add_argument('--render-workers', type=int, default=1,
+                        help='Number of processes used to lay out a PDF;'
+                             ' games are split between them (default: 1)')
+    parser.add_argument('--no-render-cache', action='store_true',
+                        help='Lay out every game in a PDF again, rather than'
+                             ' reusing the layout of unchanged games')
+    parser.add_argument('--columns',
+                        help='Game fields to show in a spreadsheet, separated'
+                             ' by commas e.g. name,yearpublished,average,rank')
+    parser.add_argument('-w', '--where', nargs='+',
+                        help='Only include games meeting these conditions,'
+                             ' quoted so the shell does not act on < > or !;'
+                             ' e.g. owned "plays>0" "players>=4" "weight<2.5"'
+                             ' (prefix a condition with ! to negate it)')
+    parser.add_argument('--sort',
+                        help='Order games on a field, e.g. rank or year;'
+                             ' prefix with ~ (or desc:) for descending, e.g.'
+                             ' ~rating (or use --sort=-rating)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Show how long BGG requests, image downloads,'
+                             ' font loading and layout took')
+    parser.add_argument('--profile-file',
+                        help='Save the timings to this file - as JSON if its'
+                             ' name ends with .json, otherwise as cProfile'
+                             ' statistics of all threads (see the pstats'
+                             ' module); other processes are not included')
+    return parser
+
+
+def parse_args(args=None):
+    """Create the parser & parse args"""
+    return create_parser().parse_args(args)
 
 
-def main(conf):
+def peek(games):
+    """
+    Return an iterator over games - with the first one already retrieved -
+    or None if there are no games.
+    """
+    games = iter(games)
+    for game in games:
+        return chain([game], games)
+    return None
+
+
+def profiled(conf, func, *args, **kwargs):
+    """
+    Call func with args; then, as set by the --profile & --profile-file
+    options, show the timings (see `profiling`) and save them to a file.
+    """
+    filename = conf.profile_file
+    cprofile = filename and not filename.endswith('.json')
+    profiler.reset()
+    try:
+        if cprofile:
+            return profile_call(filename, func, *args, **kwargs)
+        return func(*args, **kwargs)
+    finally:
+        if conf.profile:
+            print profiler.report()
+        if filename and not cprofile:
+            profiler.save(filename)
+
+
+def shared_resources(conf):
+    """
+    Create the caches, BGG client and rate limiter used to make reports;
+    these can be shared by many reports made in one process (see batch.py).
+    """
+    if conf.cache_ttl > 0:
+        store = GameCache(cache_dir=conf.cache_dir,
+                          ttl=conf.cache_ttl * 60 * 60)
+    else:
+        store = None
+    return {
+        'bgg': bgg_client(),
+        'cache': MemoryCache(store),
+        'image_cache': ImageCache(os.path.join(conf.cache_dir, 'images')),
+        'limiter': TokenBucket(),
+        # only opened (and purged of old layouts) when a table is laid out
+        'render_cache': RenderCache(conf.cache_dir),
+        'sync': CollectionSync(os.path.join(conf.cache_dir, 'collections')),
+    }
+
+
+def main(conf, shared=None):
+    """
+    Create a report.
+
+    Args:
+        conf: Namespace
+            options, as returned by parse_args()
+        shared: dict
+            caches, etc. created by shared_resources(); default is to create
+            new ones
+
+    Returns:
+        True if the report was created
+    """
     if conf.version:
         print "GameReportBuilder Test - Version 1.1"
         sys.exit(1)
@@ -62,8 +196,14 @@ def main(conf):
     if conf.style:
         if conf.style == 'excel':
             out_file = conf.file or 'games.xls'
+        elif conf.style == 'xlsx':
+            out_file = conf.file or 'games.xlsx'
         elif conf.style == 'json':
             out_file = conf.file or 'games.json'
+        elif conf.style == 'jsonl':
+            out_file = conf.file or 'games.jsonl'
+        elif ',' in conf.style:  # e.g. games_full.pdf, games_excel.xls
+            out_file = conf.file or 'games'
     zone = conf.zone or 'UK'
     if zone == 'US':
         tzone = 'US'
@@ -85,6 +225,19 @@ def main(conf):
     # https://fontlibrary.org/en/font/alegreya
     # Install them on your local system first if you want to use them!
     font_family = ['AlegreyaSansSC', 'Alegreya']
+    columns = [name.strip() for name in conf.columns.split(',')
+               if name.strip()] if conf.columns else None
+    try:
+        query = GameQuery(conditions=conf.where, sort=conf.sort)
+        sheet_columns(columns)  # check the fields
+    except ValueError as err:
+        print err
+        sys.exit(1)
+    shared = shared or shared_resources(conf)
+    cache = shared['cache']
+    sync = shared['sync'] if conf.sync else None
+    # games are laid out, or written, as they are retrieved
+    options = dict(bgg=shared['bgg'], limiter=shared['limiter'], stream=True)
 
     if DEBUG:
         games = get_games()
@@ -92,37 +245,56 @@ def main(conf):
         try:
             if len(ids) > 0:
                 games = bgg_games(
-                    ids=ids, number=count, progress=conf.progress)
+                    ids=ids, number=count, progress=conf.progress,
+                    batch_size=conf.batch_size, cache=cache,
+                    workers=conf.workers, query=query, **options)
             elif username:
                 games = bgg_games(
-                    user=username, number=count, progress=conf.progress)
+                    user=username, number=count, progress=conf.progress,
+                    batch_size=conf.batch_size, cache=cache,
+                    workers=conf.workers, sync=sync, query=query,
+                    **options)
             elif conf.input:
                 games = bgg_games(
-                    filename=conf.input, number=count, progress=conf.progress)
+                    filename=conf.input, number=count, progress=conf.progress,
+                    batch_size=conf.batch_size, cache=cache,
+                    workers=conf.workers, query=query, **options)
             else:
                 print "You need to supply IDs, or user, or a JSON filename"
                 sys.exit(1)
-        except BoardGameGeekAPIError:
-            print "Sorry - there was a problem accessing BGG"\
-                  " (also check your game ID's)"
+            games = peek(games)
+        except (BoardGameGeekAPIError, RequestException):
+            print BGG_ERROR
             sys.exit(1)
 
     if games:
         grb = GameReportBuilder(
             user=username, games=games, filename=out_file, familys=font_family,
             time=tzone, margin=36, size=psize, progress=conf.progress,
+            image_cache=shared['image_cache'],
+            image_dpi=conf.image_dpi or None, image_quality=conf.image_quality,
+            compact_json=conf.json_compact,
+            render_workers=conf.render_workers,
+            render_cache=None if conf.no_render_cache else
+            shared['render_cache'],
+            columns=columns,
             header='AlegreyaSansSCR', body='AlegreyaR')
         try:
             if conf.style:
                 grb.save_games(style=conf.style)
             else:
                 grb.save_games(style='full')
+            return True
+        # games after the first are retrieved as the output is created
+        except (BoardGameGeekAPIError, RequestException):
+            print BGG_ERROR
         except Exception as err:
             print "\nSorry!  There was an expected error: %s" % err
     else:
         print "\nSorry! No games available to create the output."
+    return False
 
 
 if __name__ == "__main__":
     conf = parse_args()
-    main(conf)
+    profiled(conf, main, conf)
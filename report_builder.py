@@ -10,12 +10,16 @@ Notes:
     * boardgamegeek
     * reportlab
     * xlwt
+    * PyPDF2 (optional; used to merge the parts of a sharded PDF report)
 """
 # lib
-from collections import OrderedDict
-import json
+from io import BytesIO
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 import os
+import shutil
 import sys
+import tempfile
 import time
 # other
 import xlwt
@@ -29,15 +33,164 @@ from reportlab.lib.utils import ImageReader
 from reportlab.lib.colors import black, white, slategray, slategrey, \
     lightgrey, lightslategray, lightslategrey, \
     red
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase.pdfmetrics import registerFontFamily
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, \
-    TableStyle, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+# local
+from fonts import BASE, registry, ttf_register
+from gamefile import write_json, write_jsonl
+from images import ImageCache, IMAGE_DPI, IMAGE_QUALITY
+from layouts import LAYOUTS, PagedTable
+from pdfmerge import PdfFileReader, merge_pdfs, page_count
+from pipeline import Pipeline
+from profiling import count, timed, timer
+from record import GameRecord, RAW_FIELDS
+from rendercache import CachedParagraph, font_signature, render_key, \
+    style_signature
+from xlsx import XLSXWriter
 
-FONTS = '.local/share/fonts'  # path for Ubuntu Linux
-HOME = os.path.expanduser("~")
-BASE = os.path.join(HOME, FONTS)
+# BGG image size variant used by each PDF style; None means no image is used
+IMAGE_SUFFIXES = {'full': '_md', 'compact': '_sq', 'summary': None}
+EXTENSIONS = {'full': '.pdf', 'compact': '.pdf', 'summary': '.pdf',
+              'excel': '.xls', 'xlsx': '.xlsx', 'json': '.json',
+              'jsonl': '.jsonl'}
+# default columns of a spreadsheet: heading, game field & width (characters)
+SHEET_COLUMNS = (
+    ('Name', 'name', 60),
+    ('ID', 'id', None),
+    ('Weight', 'averageweight', None),
+    ('% Weight', 'percentageweight', None),
+    ('Year', 'yearpublished', None),
+    ('Age', 'age', None),
+    ('Time', 'playingtime', None),
+    ('Min.', 'minplayers', None),
+    ('Max', 'maxplayers', None),
+    ('Mechanics', 'mechanics', None),
+    ('Categories', 'categories', None),
+)
+# game fields written to a spreadsheet as numbers
+NUMERIC_FIELDS = (
+    'id', 'yearpublished', 'minplayers', 'maxplayers', 'playingtime',
+    'minage', 'age', 'averageweight', 'percentageweight', 'average',
+    'bayesaverage', 'median', 'stddev', 'rank', 'usersrated', 'numcomments',
+    'numweights', 'owned', 'trading', 'wanting', 'wishing',
+)
+
+
+def is_game_field(field):
+    """Check if a name is a field of a game, e.g. name or yearpublished."""
+    return field in RAW_FIELDS or \
+        isinstance(getattr(GameRecord, field, None), property)
+
+
+def sheet_columns(columns=None):
+    """
+    Return the (heading, field, width) of each column of a spreadsheet.
+
+    Args:
+        columns: list
+            game fields e.g. ['name', 'yearpublished', 'average'], or
+            (heading, field) pairs; default is SHEET_COLUMNS
+
+    Raises:
+        ValueError if a field is not known
+    """
+    if not columns:
+        return list(SHEET_COLUMNS)
+    known = dict((field, (heading, field, width))
+                 for heading, field, width in SHEET_COLUMNS)
+    result = []
+    for column in columns:
+        field = column if isinstance(column, basestring) else column[1]
+        if not is_game_field(field):
+            raise ValueError('The column "%s" is not a known game field' %
+                             field)
+        if isinstance(column, basestring):
+            result.append(known.get(column, (column.title(), column, None)))
+        else:
+            result.append((column[0], field, known.get(field, (0, 0, None))[2]))
+    return result
+
+
+def cell_value(game, field):
+    """
+    Return a game's value for a spreadsheet cell; numeric fields (e.g. weight,
+    year, time or players) are numbers, rather than strings, where possible.
+    """
+    value = getattr(game, field, '')
+    if field not in NUMERIC_FIELDS:
+        return value
+    raw = getattr(game, '_%s' % field, None)
+    if raw is None or isinstance(raw, (list, tuple)):
+        raw = value
+    if isinstance(raw, (int, long, float)) and not isinstance(raw, bool):
+        return raw
+    try:
+        number = float(raw)
+    except (TypeError, ValueError):
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def output_name(filename, style):
+    """
+    Return the name of the file for one style of a multi-style output; e.g.
+    games_full.pdf and games_excel.xls for a filename of games.pdf
+    """
+    base = os.path.splitext(filename or 'games')[0]
+    return '%s_%s%s' % (base, style, EXTENSIONS[style])
+
+
+class FlowableStream(list):
+    """
+    List of flowables, filled from an iterable as ReportLab lays them out.
+
+    ReportLab's document build only needs the first few flowables at a time
+    (to handle `keepWithNext`); filling the list on demand means that the
+    elements for the rest of a report are not created until they are needed,
+    and those already drawn on a page can be freed.
+    """
+
+    def __init__(self, flowables, lookahead=8):
+        list.__init__(self)
+        self.source = iter(flowables)
+        self.lookahead = lookahead
+
+    def __len__(self):
+        while self.source is not None and \
+                list.__len__(self) < self.lookahead:
+            try:
+                self.append(next(self.source))
+            except StopIteration:
+                self.source = None
+        return list.__len__(self)
+
+
+def render_shard(job):
+    """
+    Lay out one shard (a chunk of the games) of a report into its own PDF;
+    run in a separate process by `GameReportBuilder.build_sharded()`.
+    """
+    options, image_paths, style, start, last = job
+    builder = GameReportBuilder(**options)
+    builder.image_paths = image_paths
+    builder.build_pdf(style, start=start, last=last, paged=False)
+    return builder.doc.filename
+
+
+def render_output(job):
+    """
+    Create the file for one style of a multi-style output; run in a separate
+    process by `GameReportBuilder.save_outputs()`.
+    """
+    options, image_paths, style = job
+    builder = GameReportBuilder(**options)
+    builder.image_paths = image_paths
+    builder.save_games(style)
+    return builder.filename
+
+
+def blank_page(canvas, doc):
+    """Page template for a shard; headers & footers are added on merging."""
+    pass
 
 
 class GameReportBuilder(object):
@@ -45,11 +198,27 @@ class GameReportBuilder(object):
     def __init__(self, *args, **kwargs):
         __version_info__ = ('1', '0', '0')
         self.__version__ = __version_info__
-        self.games = kwargs.get('games', [])  # list of 'game' objects
+        self.options = kwargs  # used to create a builder for each shard
+        # list of 'game' objects; or an iterator, e.g. as games are retrieved
+        self.games = kwargs.get('games', [])
+        self.pipeline = None  # see stream_games()
         self.user = kwargs.get('user', '')
         self.time = kwargs.get('time', 'UK')
         self.filename = kwargs.get('filename')
         self.progress = kwargs.get('progress', False)
+        self.compact_json = kwargs.get('compact_json', False)
+        self.columns = sheet_columns(kwargs.get('columns'))
+        self.image_cache = kwargs.get('image_cache') or ImageCache()
+        self.image_workers = kwargs.get('image_workers', 8)
+        self.image_dpi = kwargs.get('image_dpi', IMAGE_DPI)  # None: as-is
+        self.image_quality = kwargs.get('image_quality', IMAGE_QUALITY)
+        self.image_paths = {}  # image path -> local file (after prefetch)
+        self.image_sizes = {}  # local file -> (width, height) in pixels
+        self.render_workers = kwargs.get('render_workers', 1)
+        self.layouts = {}  # (style, doc width) -> compiled TableLayout
+        self.render_cache = kwargs.get('render_cache')  # RenderCache or None
+        self.render_fonts = None  # fonts used in render cache keys
+        self.summary_header = None
         self.family_names = kwargs.get('familys', [])
         self.font_names = kwargs.get('fonts', [])
         self.page_footer = kwargs.get(
@@ -100,22 +269,11 @@ class GameReportBuilder(object):
             Helvetica-Oblique, Courier-BoldOblique, Helvetica-BoldOblique,
             Times-Roman, Times-Bold, Times-Italic, Times-BoldItalic, Symbol,
             ZapfDingbats
+
+        Each face is only loaded once per process, and a missing font file
+        gives a warning rather than an error; see `fonts.FontRegistry`.
         """
-        if not family:
-            pdfmetrics.registerFont(TTFont(name,
-            os.path.join(base_dir, '%s.ttf' % name)))
-        else:
-            pdfmetrics.registerFont(TTFont('%sR' % name,
-                os.path.join(base_dir, '%s-Regular.ttf' % name)))
-            pdfmetrics.registerFont(TTFont('%sI' % name,
-                os.path.join(base_dir, '%s-Italic.ttf' % name)))
-            pdfmetrics.registerFont(TTFont('%sBI' % name,
-                os.path.join(base_dir, '%s-BoldItalic.ttf' % name)))
-            pdfmetrics.registerFont(TTFont('%sB' % name,
-                os.path.join(base_dir, '%s-Bold.ttf' % name)))
-            registerFontFamily(
-                '%s', normal='%sR' % name, bold='%sB' % name,
-                italic='%sI' % name, boldItalic='%sBI' % name)
+        return ttf_register(name, family=family, base_dir=base_dir)
 
     def set_doc(self, filename, margin=72, page=A4):
         _filename = filename or 'games.pdf'
@@ -131,8 +289,13 @@ class GameReportBuilder(object):
         """
         Make styles available to printing routines.
         """
-        body = body or 'Times'
-        header = header or 'Helvetica'
+        for font in (body, header):
+            if font and not registry.is_registered(font):
+                print 'The font "%s" is not available; using a default' % font
+        if not body or not registry.is_registered(body):
+            body = 'Times'
+        if not header or not registry.is_registered(header):
+            header = 'Helvetica'
         page_header = 'Helvetica'
         page_footer = 'Helvetica'
         try:
@@ -177,19 +340,95 @@ class GameReportBuilder(object):
             print "Unable to use or access the custom fonts!"
             sys.exit(1)
 
+    def get_image_path(self, game, suffix=None):
+        """
+        Get the path for a game's image; BGG images are available in various
+        sizes e.g. a suffix of '_md' for medium or '_sq' for square.
+        """
+        if suffix and 'geekdo-images' in game.image:
+            return game.image.replace('.jpg', '%s.jpg' % suffix).\
+                replace('.png', '%s.png' % suffix)
+        return game.image
+
+    @timed('get_image')
     def get_image(self, game, path, width=1*cm, height=None):
         """
         Create an image from a path - either on on disc or from a web URL.
+
+        Images from the web are sourced via the image cache; unless image_dpi
+        is None, the image is then reduced to the resolution needed for the
+        size at which it is placed.
         """
         if self.progress:
             print "Retrieving image for game: %7d" % int(game.id)
-        img = ImageReader(path)
-        iw, ih = img.getSize()
+        path = self.image_paths.get(path) or self.image_cache.get(path)
+        if path not in self.image_sizes:
+            self.image_sizes[path] = ImageReader(path).getSize()
+        iw, ih = self.image_sizes[path]
         aspect = ih / float(iw)
         if height:
-            return Image(path, width=(height * aspect), height=height)
+            width = height * aspect
         else:
-            return Image(path, width=width, height=(width * aspect))
+            height = width * aspect
+        if self.image_dpi:
+            path = self.image_cache.processed(
+                path, width, height, dpi=self.image_dpi,
+                quality=self.image_quality)
+        return Image(path, width=width, height=height)
+
+    def prefetch_images(self, style):
+        """
+        Download, concurrently, all images needed for a style into local files,
+        so that creating the tables does not have to wait on the network.
+        """
+        if style not in IMAGE_SUFFIXES or not IMAGE_SUFFIXES[style]:
+            return
+        paths = []
+        for game in self.games:
+            path = self.get_image_path(game, IMAGE_SUFFIXES[style])
+            if path and path not in self.image_paths and path not in paths:
+                paths.append(path)
+        if not paths:
+            return
+        if self.progress:
+            print "Prefetching %d images ... ... ..." % len(paths)
+        start = time.time()
+        pool = ThreadPool(max(int(self.image_workers), 1))
+        try:
+            local_paths = pool.map(self.image_cache.get, paths)
+        finally:
+            pool.close()
+            pool.join()
+        self.image_paths.update(zip(paths, local_paths))
+        if self.progress:
+            print "Prefetched %d images in %.1f seconds" % (
+                len(paths), time.time() - start)
+
+    def prefetch_game(self, game, style):
+        """
+        Download a game's image for a style into a local file, unless already
+        done; return the game.
+        """
+        path = self.get_image_path(game, IMAGE_SUFFIXES[style])
+        if path and path not in self.image_paths:
+            self.image_paths[path] = self.image_cache.get(path)
+        return game
+
+    def stream_games(self, style):
+        """
+        Pass this builder's games - an iterator, e.g. yielding games as they
+        are retrieved from BGG - through a pipeline, so that the images for
+        the next games are downloaded while earlier ones are laid out (or
+        written to file); see `pipeline.Pipeline`.
+        """
+        self.pipeline = Pipeline(
+            self.games, name='fetch',
+            consumer='layout' if style in IMAGE_SUFFIXES else 'write')
+        if IMAGE_SUFFIXES.get(style):
+            self.pipeline.add(
+                'images', lambda game: self.prefetch_game(game, style),
+                workers=self.image_workers)
+        self.games = self.pipeline
 
     def set_header_footer(self, canvas, doc):
         """
@@ -215,14 +454,19 @@ class GameReportBuilder(object):
     def create_json(self):
         """
         Create a JSON file containing games' details; entries keyed on game ID
+
+        Games are written one at a time; see `gamefile` for the file layout.
         """
-        game_list = {}
-        for number, game in enumerate(self.games):
-            game_list[int(game.id)] = game.__dict__
-        dump = json.dumps(game_list, indent=2, default=str)
-        _file = open(self.filename, 'w')
-        print >> _file, dump
-        _file.close()
+        with open(self.filename, 'w') as _file:
+            write_json(self.games, _file, compact=self.compact_json)
+
+    def create_jsonl(self):
+        """
+        Create a line-delimited JSON file containing games' details; one game
+        per line
+        """
+        with open(self.filename, 'w') as _file:
+            write_jsonl(self.games, _file)
 
     def create_xls(self):
         """
@@ -230,34 +474,60 @@ class GameReportBuilder(object):
         """
         workbook = xlwt.Workbook()
         sheet = workbook.add_sheet("Summary")
-        sheet.col(0).width = 256 * 60
         bold_style = xlwt.easyxf('font: bold 1')
-        _items = (
-            ('Name', 'name'),
-            ('ID', 'id'),
-            ('Weight', 'averageweight'),
-            ('% Weight', 'percentageweight'),
-            ('Year', 'yearpublished'),
-            ('Age', 'age'),
-            ('Time', 'playingtime'),
-            ('Min.', 'minplayers'),
-            ('Max', 'maxplayers'),
-            ('Mechanics', 'mechanics'),
-            ('Categories', 'categories'),
-        )
-        items = OrderedDict(_items)
-        for col, head in enumerate(items.keys()):
+        for col, (head, field, width) in enumerate(self.columns):
             sheet.write(0, col, head, bold_style)
+            if width:
+                sheet.col(col).width = 256 * width
         for number, game in enumerate(self.games):
             if self.progress:
                 print "Creating the row for game: %7d" % int(game.id)
-                for col, head in enumerate(items.keys()):
-                    sheet.write(number + 1, col, getattr(game, items[head]))
+            for col, (head, field, width) in enumerate(self.columns):
+                sheet.write(number + 1, col, cell_value(game, field))
         workbook.save(self.filename)
 
-    def create_table_summary(self, game, num):
+    def create_xlsx(self):
+        """
+        Create an XLSX spreadsheet displaying games' details; one game per
+        row.  Rows are written as they are created; see `xlsx.XLSXWriter`.
+        """
+        widths = [width for head, field, width in self.columns]
+        with XLSXWriter(self.filename, "Summary", widths) as book:
+            book.write_row([head for head, field, width in self.columns],
+                           bold=True)
+            for game in self.games:
+                if self.progress:
+                    print "Creating the row for game: %7d" % int(game.id)
+                book.write_row([cell_value(game, field)
+                                for head, field, width in self.columns])
+
+    def get_layout(self, style):
+        """
+        Return the layout of the per-game table for a style; each layout is
+        compiled once for the document's width.
+        """
+        key = (style, self.doc.width)
+        if key not in self.layouts:
+            self.layouts[key] = LAYOUTS[style](self.doc.width, self.styles)
+        return self.layouts[key]
+
+    def get_summary_header(self):
+        """Return the (created once) header row for the summary style."""
+        if self.summary_header is None:
+            self.summary_header = [
+                Paragraph('<b>Name</b>', self.styles['info']),
+                Paragraph('<b>Weight (%)</b>', self.styles['left']),
+                Paragraph('<b>Year</b>', self.styles['left']),
+                Paragraph('<b>Age</b>', self.styles['left']),
+                Paragraph('<b>Time</b>', self.styles['left']),
+                Paragraph('<b>Players</b>', self.styles['left']),
+            ]
+        return self.summary_header
+
+    @timed('create_row_summary')
+    def create_row_summary(self, game):
         """
-        Create a reportlab table displaying summarised game information.
+        Create the cells of a summary table row for a game.
 
         Args:
             game: object
@@ -265,43 +535,55 @@ class GameReportBuilder(object):
                 game attributes e.g. name, description
         """
         if self.progress:
-            print "Generating summary table for game: %7d" % int(game.id)
             print "Generating a summary row for game: %7d" % int(game.id)
-        div = self.doc.width / 7.0
-        table_data = [
-            [
-                Paragraph('<b>%s</b>' % game.name, self.styles['left']),
-                Paragraph('<b>%s (%s)</b>' %
-                          (game.averageweight, game.percentageweight),
-                          self.styles['left']),
-                Paragraph('<b>%s</b>' % game.yearpublished, self.styles['left']),
-                Paragraph('<b>%s</b>' % game.age, self.styles['left']),
-                Paragraph('<b>%s</b>' % game.playingtime, self.styles['left']),
-                Paragraph('<b>%s</b>' % game.players, self.styles['left']),
-            ]
+        return [
+            Paragraph('<b>%s</b>' % game.name, self.styles['left']),
+            '%s (%s)' % (game.averageweight, game.percentageweight),
+            game.yearpublished,
+            game.age,
+            game.playingtime,
+            game.players,
         ]
-        if num == 0:
-            table_data.insert(0,
-                [
-                    Paragraph('<b>Name</b>', self.styles['info']),
-                    Paragraph('<b>Weight (%)</b>', self.styles['left']),
-                    Paragraph('<b>Year</b>', self.styles['left']),
-                    Paragraph('<b>Age</b>', self.styles['left']),
-                    Paragraph('<b>Time</b>', self.styles['left']),
-                    Paragraph('<b>Players</b>', self.styles['left']),
-                ]
-            )
-        # create the table
-        game_table = Table(table_data,
-                           colWidths=[div*2, div, div, div, div, div])
-        game_table.setStyle(
-            TableStyle([
-                        ('BOX', (0, 0), (-1, -1), 0.5, black),
-                        ('VALIGN',(0,0), (-1,-1), 'TOP'),
-                       ]),
-                      )
-        return game_table
 
+    def create_table_summary(self, games):
+        """
+        Create a reportlab table displaying summarised information for games;
+        one row per game, under a header row repeated on each page.
+
+        Rows are only created as each page is laid out; see `PagedTable`.
+
+        Args:
+            games: list
+                BGGGame objects (or similar) whose properties correspond to
+                game attributes e.g. name, description
+        """
+        return PagedTable(
+            self.get_layout('summary'), self.get_summary_header(),
+            (self.create_row_summary(game) for game in games))
+
+    def create_paragraphs(self, style, cells):
+        """
+        Create the paragraphs for a game's table; if there is a render cache,
+        unchanged paragraphs are reused - already wrapped - from it.
+
+        Args:
+            style: string
+                one of full or compact
+            cells: list
+                text and paragraph style name of each paragraph
+        """
+        cells = [(text, self.styles[name]) for text, name in cells]
+        if not self.render_cache:
+            return [CachedParagraph(text, para_style)
+                    for text, para_style in cells]
+        if self.render_fonts is None:
+            self.render_fonts = font_signature()
+        key = render_key(
+            style, tuple(self.doc.pagesize), self.doc.width, self.render_fonts,
+            [(text, style_signature(para_style)) for text, para_style in cells])
+        return self.render_cache.paragraphs(key, cells)
+
+    @timed('create_table_compact')
     def create_table_compact(self, game):
         """
         Create a compact reportlab table displaying game information.
@@ -313,49 +595,27 @@ class GameReportBuilder(object):
         """
         if self.progress:
             print "Generating table for game: %7d" % (int(game.id))
-        div = self.doc.width / 7.0
-        HT = 0.6 * cm
-        # note that 'n' in div * n MUST correspond to number of cols spanned
-        if 'geekdo-images' in game.image:
-            _image = game.image.replace('.jpg', '_sq.jpg').replace('.png', '_sq.png')
-        else:
-            _image = game.image
-        game_image = self.get_image(game, path=_image, height=HT*3 - 8)
+        layout = self.get_layout('compact')
+        _image = self.get_image_path(game, '_sq')
+        game_image = self.get_image(game, path=_image,
+                                    height=layout.image_height)
+        name, age, playingtime, players, mechanics, categories = \
+            self.create_paragraphs('compact', [
+                ('<b>%s</b>' % game.name, 'info'),
+                ('<b>%s</b>' % game.age, 'centre'),
+                ('<b>%s</b> min' % game.playingtime, 'centre'),
+                ('<b>%s</b> players' % game.players, 'right'),
+                ('%s' % game.mechanics, 'left'),
+                ('%s' % game.categories, 'left'),
+            ])
         table_data = [
-            [
-                game_image,
-                Paragraph('<b>%s</b>' % game.name, self.styles['info']),
-                '', '',
-                Paragraph('<b>%s</b>' % game.age, self.styles['centre']),
-                Paragraph('<b>%s</b> min' % game.playingtime, self.styles['centre']),
-                Paragraph('<b>%s</b> players' % game.players, self.styles['right'])
-            ],
-            [
-                '', Paragraph('%s' % game.mechanics, self.styles['left']),
-                '', '', '', '', ''
-            ],
-            [
-                '', Paragraph('%s' % game.categories, self.styles['left']),
-                '', '', '', '', ''
-            ]
+            [game_image, name, '', '', age, playingtime, players],
+            ['', mechanics, '', '', '', '', ''],
+            ['', categories, '', '', '', '', '']
         ]
-        # create the table
-        game_table = Table(table_data,
-                           colWidths=[div, div, div, div, div, div, div],
-                           rowHeights=[HT] * len(table_data))
-        game_table.setStyle(
-            TableStyle([
-                        ('BOX', (0, 0), (-1, -1), 0.5, black),
-                        ('VALIGN',(0,0), (-1,-1), 'TOP'),
-                        ('SPAN',(0,0),(0,2)),
-                        ('SPAN',(1,0),(3,0)),
-                        ('SPAN',(1,1),(6,1)),
-                        ('SPAN',(1,2),(6,2)),
-                       ]),
-                      )
-        return game_table
-
+        return layout.table(table_data)
 
+    @timed('create_table')
     def create_table(self, game):
         """
         Create a reportlab table displaying game information.
@@ -367,59 +627,27 @@ class GameReportBuilder(object):
         """
         if self.progress:
             print "Generating table for game: %7d" % int(game.id)
-        div = self.doc.width / 8.0
-        # note that 'n' in div * n MUST correspond to number of cols spanned
-        if 'geekdo-images' in game.image:
-            _image = game.image.replace('.jpg', '_md.jpg').replace('.png', '_md.png')
-        else:
-            _image = game.image
-        game_image = self.get_image(game, path=_image, width=div * 3 - 9)
+        layout = self.get_layout('full')
+        _image = self.get_image_path(game, '_md')
+        game_image = self.get_image(game, path=_image,
+                                    width=layout.image_width)
+        age, published, playingtime, players, categories, mechanics, \
+            description = self.create_paragraphs('full', [
+                ('<b>Ages</b>: %s' % game.age, 'info'),
+                ('<b>Published</b>: %s' % game.yearpublished, 'info'),
+                ('<b>Time</b>: %s min' % game.playingtime, 'info'),
+                ('<b>Players</b>: %s' % game.players, 'info'),
+                ('<b>Categories</b>: %s' % game.categories, 'info'),
+                ('<b>Mechanics</b>: %s' % game.mechanics, 'info'),
+                (game.description_html, 'left'),
+            ])
         table_data = [
-            [
-                Paragraph('<b>Ages</b>: %s' % game.age,
-                          self.styles['info']),
-                '',
-                Paragraph('<b>Published</b>: %s' % game.yearpublished,
-                          self.styles['info']),
-                '',
-                Paragraph('<b>Time</b>: %s min' % game.playingtime, self.styles['info']),
-                '',
-                Paragraph('<b>Players</b>: %s' % game.players, self.styles['info']),
-                ''
-            ],
-            [
-                Paragraph('<b>Categories</b>: %s' % game.categories, self.styles['info']),
-                '', '', '', '', '', '', ''
-            ],
-            [
-                Paragraph('<b>Mechanics</b>: %s' % game.mechanics, self.styles['info']),
-                '', '', '', '', '', '', ''
-            ],
-            [
-                Paragraph(game.description_html, self.styles['left']),
-                '', '', '', '',
-                game_image,
-                '', ''
-            ]
+            [age, '', published, '', playingtime, '', players, ''],
+            [categories, '', '', '', '', '', '', ''],
+            [mechanics, '', '', '', '', '', '', ''],
+            [description, '', '', '', '', game_image, '', '']
         ]
-        # create the table
-        game_table = Table(table_data,
-                           colWidths=[div, div, div, div, div, div, div, div])
-        game_table.setStyle(
-            TableStyle([
-                        ('BOX', (0, 0), (-1, -1), 0.5, black),
-                        ('VALIGN',(0,0), (-1,-1), 'TOP'),
-                        ('SPAN',(0,0),(1,0)),
-                        ('SPAN',(2,0),(3,0)),
-                        ('SPAN',(4,0),(5,0)),
-                        ('SPAN',(6,0),(7,0)),
-                        ('SPAN',(0,1),(7,1)),
-                        ('SPAN',(0,2),(7,2)),
-                        ('SPAN',(0,3),(4,3)),
-                        ('SPAN',(5,3),(7,3)),
-                       ]),
-                      )
-        return game_table
+        return layout.table(table_data)
 
     def create_qr(self, ID, width=2*cm, prefix=None, suffix=None):
         """
@@ -432,55 +660,227 @@ class GameReportBuilder(object):
         img = self.get_image(url, width)
         return img
 
-    def save_games(self, style='full'):
+    def create_elements(self, style, games, start=0, last=True):
+        """
+        Generate the elements such as paragraphs & tables for a PDF of games.
+
+        Args:
+            style: string
+                one of full, compact or summary
+            games: list
+                BGGGame objects (or similar) to include
+            start: int
+                number, in the whole report, of the first of these games
+            last: boolean
+                if True, end with the "Printed at" note
+        """
+        if style in ['summary', 'compact'] and start == 0:
+            yield Spacer(1, 0.5*cm)
+        # Create table per game; or, for a summary, a row per game
+        if style == 'summary':
+            yield self.create_table_summary(games)
+        elif style == 'full':
+            for game in games:
+                gtable = self.create_table(game)
+                header = Paragraph('<b>%s</b>' % game.name,
+                                   self.styles['CentreHeader'])
+                header.keepWithNext = True
+                yield header
+                yield gtable
+        elif style == 'compact':
+            for game in games:
+                yield self.create_table_compact(game)
+        # After tables
+        if last:
+            yield Spacer(1, 0.5*cm)
+            if self.time == 'US':
+                _date = time.strftime("%b %d, %Y %H:%M")
+            else:
+                _date = time.strftime("%Y-%m-%d %H:%M")
+            yield Paragraph('Printed at %s' % _date, self.styles['right'])
+
+    def build_pdf(self, style, start=0, last=True, paged=True):
+        """
+        Lay out, and save, a PDF for all of this builder's games.
+
+        Elements are created as the layout reaches them, and each page is
+        written out as it is completed, so memory use does not grow with the
+        number of games.
+
+        Args:
+            paged: boolean
+                if False, pages have no header & footer (see `build_sharded`)
+        """
+        elements = FlowableStream(
+            self.create_elements(style, self.games, start, last))
+        if self.progress:
+            print "Generating PDF Document... ... ..."
+        on_page = self.set_header_footer if paged else blank_page
+        with timer('doc.build'):
+            self.doc.build(elements, onFirstPage=on_page,
+                           onLaterPages=on_page)
+        count('PDF pages', self.doc.page)
+        if self.render_cache:
+            self.render_cache.flush()
+
+    def build_sharded(self, style):
+        """
+        Lay out a PDF in parts, one per shard of games, in parallel processes;
+        then merge the parts into a single PDF.
+
+        Headers and footers are drawn on the merged pages, so that page numbers
+        run on from one part to the next.  Each part starts on a new page.
+        """
+        workers = min(int(self.render_workers), len(self.games))
+        size = -(-len(self.games) // workers)  # round up
+        tmp_dir = tempfile.mkdtemp(prefix='gamereport')
+        jobs = []
+        for number, start in enumerate(range(0, len(self.games), size)):
+            options = dict(self.options)
+            options.update({
+                'games': self.games[start:start + size],
+                'filename': os.path.join(tmp_dir, 'part%04d.pdf' % number),
+                'image_cache': self.image_cache,
+                'render_workers': 1})
+            jobs.append((options, self.image_paths, style, start,
+                         start + size >= len(self.games)))
+        if self.progress:
+            print "Generating PDF Document in %d parts ... ... ..." % len(jobs)
+        pool = Pool(workers)
+        try:
+            parts = pool.map(render_shard, jobs)
+            pool.close()
+            self.merge_parts(parts)
+        finally:
+            pool.terminate()
+            pool.join()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def merge_parts(self, parts):
+        """
+        Merge PDF files into this builder's file, drawing a header & footer
+        on each page.
+        """
+        # headers & footers for all pages, in one document to be overlaid
+        overlay_file = BytesIO()
+        overlay = canvas.Canvas(overlay_file, pagesize=self.doc.pagesize)
+        for page in range(page_count(parts)):
+            self.set_header_footer(overlay, self.doc)
+            overlay.showPage()
+        overlay.save()
+        overlay_file.seek(0)
+        with open(self.doc.filename, 'wb') as pdf_file:
+            merge_pdfs(parts, pdf_file, overlay_file)
+
+    def save_outputs(self, styles, filenames=None):
+        """
+        Create a file for each of a number of styles, all at the same time
+        (each in its own process), from this builder's games.
+
+        Images needed by any of the styles are prefetched once, beforehand.
+
+        Args:
+            styles: list
+                names of styles e.g. ['full', 'compact', 'excel', 'json']
+            filenames: dict
+                name of the file for each style; default names are made from
+                this builder's filename (see `output_name`)
+        """
+        filenames = filenames or {}
+        for style in styles:
+            if style not in EXTENSIONS:
+                print 'The style "%s" does not exist!' % style
+                sys.exit(1)
+        self.games = list(self.games)  # each output needs all the games
+        for style in styles:
+            self.prefetch_images(style)
+        jobs = []
+        for style in styles:
+            options = dict(self.options)
+            options.update({
+                'games': self.games,
+                'filename': filenames.get(style) or
+                output_name(self.filename, style),
+                'image_cache': self.image_cache,
+                'render_workers': 1})  # no processes within processes
+            jobs.append((options, self.image_paths, style))
+        if self.progress:
+            print "Generating %d outputs ... ... ..." % len(jobs)
+        pool = Pool(len(jobs))
+        try:
+            names = pool.map(render_output, jobs)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+        if self.progress:
+            print "Created %s" % ', '.join(names)
+        return names
+
+    def save_games(self, style='full', filenames=None):
         """
         Primary routine to drive creation of a reportlab PDF.
 
-        Elements such as paragraphs & tables are collated in a list; and then
-        the document is created.
+        Any images needed are first prefetched; then elements such as
+        paragraphs & tables are created, and laid out, one at a time.
 
         Headers and Footer are set via the doc.build().
+
+        If `render_workers` is more than 1 (and PyPDF2 is available), the games
+        are split into that many shards, laid out in parallel; see
+        `build_sharded()`.
+
+        Several styles can be given, separated by commas (or as a list); the
+        files for these are then created together; see `save_outputs()`.
         """
-        elements = []
-        if style in ['summary', 'compact']:
-            elements.append(Spacer(1, 0.5*cm))
+        if not isinstance(style, basestring):
+            style = ','.join(style)
+        styles = [name.strip() for name in style.split(',') if name.strip()]
+        if len(styles) > 1:
+            return self.save_outputs(styles, filenames)
+        style = styles[0] if styles else style
+        if not isinstance(self.games, (list, tuple)):
+            if style in IMAGE_SUFFIXES and self.render_workers > 1:
+                self.games = list(self.games)  # to be split into shards
+            else:
+                self.stream_games(style)
         # All done!
         if style in ['full', 'compact', 'summary']:
-            # Create table per game
-            for number, game in enumerate(self.games):
-                if style == 'full':
-                    gtable = self.create_table(game)
-                    header = Paragraph('<b>%s</b>' % game.name,
-                                       self.styles['CentreHeader'])
-                    header.keepWithNext = True
-                    elements.append(header)
-                    elements.append(gtable)
-                elif style == 'compact':
-                    gtable = self.create_table_compact(game)
-                    elements.append(gtable)
-                elif style == 'summary':
-                    gtable = self.create_table_summary(game, number)
-                    elements.append(gtable)
-            # After tables
-            elements.append(Spacer(1, 0.5*cm))
-            if self.time == 'US':
-                _date = time.strftime("%b %d, %Y %H:%M")
+            if self.pipeline:
+                if self.progress:
+                    print "Generating tables as games are retrieved ... ..."
             else:
-                _date = time.strftime("%Y-%m-%d %H:%M")
-            p2 = Paragraph('Printed at %s' % _date, self.styles['right'])
-            elements.append(p2)
+                self.prefetch_images(style)
+                if self.progress:
+                    print "Generating tables for %d games ... ..." % \
+                        len(self.games)
+            if self.render_workers > 1 and len(self.games) > 1:
+                if PdfFileReader:
+                    self.build_sharded(style)
+                else:
+                    print "PyPDF2 is needed to lay out a PDF in parallel!"
+                    self.build_pdf(style)
+            else:
+                self.build_pdf(style)
             if self.progress:
-                print "Generating PDF Document... ... ..."
-            self.doc.build(
-                elements,
-                onFirstPage=self.set_header_footer,
-                onLaterPages=self.set_header_footer)
+                print self.image_cache.stats()
+                if self.render_cache:
+                    print self.render_cache.stats()
+                print registry.stats()
         elif style == 'excel':
             print "Generating XLS Spreadsheet ... ..."
             self.create_xls()
+        elif style == 'xlsx':
+            print "Generating XLSX Spreadsheet ... ..."
+            self.create_xlsx()
         elif style == 'json':
             print "Generating a JSON File ... ... ..."
             self.create_json()
+        elif style == 'jsonl':
+            print "Generating a JSONL File ... ... ..."
+            self.create_jsonl()
         else:
             print 'The style "%s" does not exist!' % style
-            sys.exit(1)
\ No newline at end of file
+            sys.exit(1)
+        if self.pipeline and self.progress:
+            print self.pipeline.stats()
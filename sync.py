@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Incremental sync of a BGG user's collection; only games which have been
+    added to (or modified in) the collection since the last run need to be
+    retrieved from BoardGameGeek.
+Notes:
+    A snapshot of each user's collection - the status of every game, plus the
+    game's data - is kept as a JSON file, one per user.
+"""
+# lib
+import json
+import os
+import tempfile
+# third party
+from boardgamegeek.games import BoardGame
+# local
+from cache import CACHE_DIR
+from gamefile import game_record, raw_record
+
+SYNC_DIR = os.path.join(CACHE_DIR, 'collections')
+STATUS_FIELDS = (
+    'lastmodified', 'own', 'preordered', 'prevowned', 'want', 'wanttobuy',
+    'wanttoplay', 'fortrade', 'wishlist', 'wishlistpriority')
+
+
+def item_status(item):
+    """Return the status of a game in a collection, as a dict."""
+    data = item.data()
+    return dict((key, data.get(key)) for key in STATUS_FIELDS)
+
+
+class CollectionSync(object):
+    """Snapshots of users' collections, used to find games that changed."""
+
+    def __init__(self, sync_dir=None):
+        """
+        Args:
+            sync_dir: string
+                directory in which snapshots are kept; default is
+                ~/.cache/gamereporter/collections
+        """
+        self.sync_dir = sync_dir or SYNC_DIR
+        self.reused = 0
+        self.changed = 0
+        if not os.path.isdir(self.sync_dir):
+            os.makedirs(self.sync_dir)
+
+    def path_for(self, user):
+        """Return the name of the snapshot file for a user."""
+        safe = ''.join(char if char.isalnum() or char in '-_.' else '_'
+                       for char in user)
+        return os.path.join(self.sync_dir, '%s.json' % safe)
+
+    def load(self, user):
+        """Return the last snapshot for a user, keyed on game ID (a string)."""
+        try:
+            with open(self.path_for(user)) as snap_file:
+                return json.load(snap_file).get('items', {})
+        except (IOError, ValueError):
+            return {}
+
+    def unchanged(self, user, collection):
+        """Return games whose status is the same as in the last snapshot.
+
+        Args:
+            user: string
+                BGG user name
+            collection: Collection
+                the user's collection, as just retrieved from BGG
+
+        Returns:
+            dict of BoardGame objects, keyed on game ID
+        """
+        snapshot = self.load(user)
+        games = {}
+        for item in collection:
+            entry = snapshot.get('%s' % item.id)
+            if entry and entry.get('status') == item_status(item) \
+                    and entry.get('game'):
+                # as read from a file; e.g. "" saved by older versions
+                games[item.id] = BoardGame(raw_record(entry['game']))
+        self.reused = len(games)
+        self.changed = len(collection) - self.reused
+        return games
+
+    def save(self, user, collection, games, partial=False):
+        """Save a new snapshot for a user's collection.
+
+        Args:
+            user: string
+                BGG user name
+            collection: Collection
+                the user's collection, as just retrieved from BGG
+            games: list
+                BGGGame objects for games retrieved in this run; games in
+                the collection but not in this list keep their data from the
+                last snapshot, if their status is unchanged
+            partial: boolean
+                True if the collection was only part of the user's collection
+                (e.g. only owned games); games not in it then keep their
+                entries in the snapshot
+        """
+        snapshot = self.load(user)
+        current = dict((game._id, game_record(game)) for game in games
+                       if game._id is not None)
+        items = dict(snapshot) if partial else {}
+        for item in collection:
+            key = '%s' % item.id
+            status = item_status(item)
+            data = current.get(item.id)
+            if data is None and key in snapshot \
+                    and snapshot[key].get('status') == status:
+                data = snapshot[key].get('game')
+            if data is not None:
+                items[key] = {'status': status, 'game': data}
+        handle, tmp_path = tempfile.mkstemp(dir=self.sync_dir)
+        with os.fdopen(handle, 'w') as snap_file:
+            json.dump({'user': user, 'items': items}, snap_file)
+        os.rename(tmp_path, self.path_for(user))
+
+    def stats(self):
+        """Return a summary of the last sync."""
+        return 'Collection sync: %d games unchanged, %d new or modified' % (
+            self.reused, self.changed)
@@ -0,0 +1,78 @@
+"""
+Tests of saving games to - and loading them back from - JSON files.
+
+Run from the top directory with: python -m unittest discover tests
+"""
+# lib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+# local
+from bgg import file_games
+from gamefile import write_json, write_jsonl
+from record import GameRecord
+from report_builder import cell_value
+
+
+def bare_game():
+    """Return a game with no weight, rating or rank."""
+    return GameRecord(id=1, name=u'Bare', minplayers=2, maxplayers=4,
+                      yearpublished=2016)
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def save_and_load(self, writer, name):
+        filename = os.path.join(self.tmp_dir, name)
+        with open(filename, 'w') as out_file:
+            writer([bare_game()], out_file)
+        return filename, list(file_games(filename))
+
+    def check_game(self, game):
+        self.assertEqual(game._averageweight, None)
+        self.assertEqual(game._ranks, None)
+        self.assertEqual(game.averageweight, '')
+        self.assertEqual(game.percentageweight, '')
+        self.assertEqual(game.average, '')
+        self.assertEqual(game.rank, '')
+        self.assertEqual(game.players, '2-4')
+        self.assertEqual(cell_value(game, 'average'), '')
+        self.assertEqual(cell_value(game, 'yearpublished'), 2016)
+
+    def test_json(self):
+        filename, games = self.save_and_load(write_json, 'games.json')
+        with open(filename) as json_file:
+            record = json.load(json_file)['games']['1']
+        self.assertEqual(record['averageweight'], None)  # saved as null
+        self.assertEqual(record['ranks'], None)
+        self.assertEqual(len(games), 1)
+        self.check_game(games[0])
+
+    def test_jsonl(self):
+        filename, games = self.save_and_load(write_jsonl, 'games.jsonl')
+        self.assertEqual(len(games), 1)
+        self.check_game(games[0])
+
+    def test_empty_strings(self):
+        # files saved by older versions hold "" for missing values
+        filename = os.path.join(self.tmp_dir, 'old.json')
+        with open(filename, 'w') as json_file:
+            json.dump({'version': 1, 'fields': ['id', 'name'], 'games': {
+                '1': {'id': 1, 'name': 'Bare', 'minplayers': 2,
+                      'maxplayers': 4, 'yearpublished': 2016,
+                      'averageweight': '', 'average': '', 'ranks': '',
+                      'alternative_names': ''}}}, json_file)
+        games = list(file_games(filename))
+        self.check_game(games[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Tests of the conversion of BGG markup to reportlab Paragraph markup.
+
+Run from the top directory with: python -m unittest discover tests
+"""
+# lib
+import unittest
+# reportlab
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph
+# local
+from markup import bgg_to_html
+
+STYLE = getSampleStyleSheet()['Normal']
+
+
+class MarkupTest(unittest.TestCase):
+
+    def convert(self, text):
+        """Return the Paragraph markup for text; check it can be laid out."""
+        html = bgg_to_html(text)[0]
+        Paragraph(html, STYLE).wrap(400, 400)
+        return html
+
+    def test_color(self):
+        self.assertEqual(self.convert('[color=#FF0000]x[/color]'),
+                         '<font color="#FF0000">x</font>')
+        self.assertEqual(self.convert('[COLOR=red]x[/color]'),
+                         '<font color="red">x</font>')
+
+    def test_unknown_color(self):
+        self.assertEqual(self.convert('a [color=blah]b[/color] c'), 'a b c')
+
+    def test_url_case(self):
+        self.assertEqual(
+            self.convert('[URL]http://example.com[/URL] x'),
+            '<a href="http://example.com" color="blue">http://example.com</a>'
+            ' x')
+        self.assertEqual(
+            self.convert('[url]http://example.com[/Url]'),
+            '<a href="http://example.com" color="blue">http://example.com</a>')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Tests of the incremental sync of a user's collection.
+
+Run from the top directory with: python -m unittest discover tests
+"""
+# lib
+import json
+import shutil
+import tempfile
+import unittest
+# third party
+from boardgamegeek.games import BoardGame
+# local
+from bgg import BGGGame
+from sync import CollectionSync
+
+
+class Item(object):
+    """Game in a collection listing, as returned by BGG."""
+
+    def __init__(self, game_id, lastmodified='2016-06-01 10:00:00'):
+        self.id = game_id
+        self.lastmodified = lastmodified
+
+    def data(self):
+        return {'id': self.id, 'own': 1, 'lastmodified': self.lastmodified}
+
+
+def check_formatting(test, game):
+    test.assertEqual(game.averageweight, '')
+    test.assertEqual(game.percentageweight, '')
+    test.assertEqual(game.average, '')
+    test.assertEqual(game.rank, '')
+    test.assertEqual(game.name, 'Bare')
+
+
+class SyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.sync = CollectionSync(self.tmp_dir)
+        self.collection = [Item(1)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def reused_games(self):
+        """Run a second sync; return the games reused from the snapshot."""
+        known = self.sync.unchanged('user', self.collection)
+        self.assertEqual(list(known), [1])
+        return [BGGGame(game=game) for game in known.values()]
+
+    def test_twice(self):
+        # first run: the game (with no weight, rating or rank) is retrieved
+        game = BGGGame(game=BoardGame({'id': 1, 'name': 'Bare'}))
+        check_formatting(self, game)
+        self.sync.save('user', self.collection, [game])
+        # second run: the unchanged game comes from the snapshot
+        for game in self.reused_games():
+            check_formatting(self, game)
+
+    def test_empty_strings(self):
+        # snapshots saved by older versions hold "" for missing values
+        status = dict((key, None) for key in (
+            'preordered', 'prevowned', 'want', 'wanttobuy', 'wanttoplay',
+            'fortrade', 'wishlist', 'wishlistpriority'))
+        status.update({'own': 1, 'lastmodified': '2016-06-01 10:00:00'})
+        with open(self.sync.path_for('user'), 'w') as snap_file:
+            json.dump({'user': 'user', 'items': {'1': {
+                'status': status,
+                'game': {'id': 1, 'name': 'Bare', 'averageweight': '',
+                         'average': '', 'ranks': '', 'expands': [],
+                         'expansions': []}}}}, snap_file)
+        for game in self.reused_games():
+            check_formatting(self, game)
+
+
+if __name__ == '__main__':
+    unittest.main()
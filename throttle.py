@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Keep concurrent access to BoardGameGeek within friendly limits.
+Notes:
+    BGG responds to over-eager clients with HTTP 202/503 replies; these are
+    raised as a BoardGameGeekAPIRetryError (see `bgg.get_xml_response`), and
+    retried only by `with_retry`.
+"""
+# lib
+import threading
+import time
+# third party
+from boardgamegeek.exceptions import BoardGameGeekAPIRetryError
+# local
+from profiling import timed, timer
+
+RATE = 2.0  # sustained no. of requests per second
+BURST = 4  # max. no. of requests that can be sent in a burst
+RETRIES = 4
+BACKOFF = 5.0  # seconds before the first retry; doubled for each one after
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket; each request to BGG must take a token."""
+
+    def __init__(self, rate=RATE, burst=BURST):
+        """
+        Args:
+            rate: float
+                no. of tokens added to the bucket per second
+            burst: int
+                max. no. of tokens the bucket can hold
+        """
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self.tokens = float(self.burst)
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    @timed('rate limit wait')
+    def take(self):
+        """Wait until a token is available, then remove it from the bucket."""
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def with_retry(func, retries=RETRIES, backoff=BACKOFF, progress=False):
+    """Call func(); retry, with exponential backoff, if BGG asks us to.
+
+    Args:
+        func: callable
+            function, with no args, that makes a request to BGG
+        retries: int
+            max. no. of times to retry func before giving up
+        backoff: float
+            seconds to wait before the first retry; doubled for each retry
+        progress: boolean
+            show when a retry is going to be made
+    """
+    delay = backoff
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except BoardGameGeekAPIRetryError:
+            if attempt >= retries:
+                raise
+            if progress:
+                print "BGG is busy; retrying in %.0f seconds ..." % delay
+            with timer('BGG retry wait'):
+                time.sleep(delay)
+            delay *= 2
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Author: Derek Hohls
+Date: June 2016
+Purpose:
+    Write a single-sheet Excel (XLSX) workbook, one row at a time.
+Notes:
+    Rows are written to a temporary file as they are added, and that file is
+    then zipped - with the few other parts an XLSX file needs - into the
+    workbook, so memory use does not grow with the number of rows.
+
+    Numbers are written as numeric cells, and everything else as (inline)
+    text cells; the header row can be made bold.
+"""
+# lib
+import math
+import os
+import re
+import tempfile
+from xml.sax.saxutils import escape
+import zipfile
+
+MAX_ROWS = 1048576
+# characters which are not allowed in XML
+INVALID = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>'''
+ROOT_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="%s" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''
+WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>'''
+STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>
+</styleSheet>'''
+SHEET_START = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+'''
+SHEET_END = '</sheetData></worksheet>'
+
+
+def column_name(number):
+    """Return the Excel name of a column, from its number; 0 is A."""
+    name = ''
+    number += 1
+    while number:
+        number, rem = divmod(number - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+def cell_xml(ref, value, bold=False):
+    """Return the XML for one cell; numbers are kept as numbers."""
+    style = ' s="1"' if bold else ''
+    if isinstance(value, (int, long)) and not isinstance(value, bool):
+        return '<c r="%s"%s><v>%d</v></c>' % (ref, style, value)
+    if isinstance(value, float) and not math.isinf(value) and \
+            not math.isnan(value):
+        return '<c r="%s"%s><v>%r</v></c>' % (ref, style, value)
+    if value is None:
+        value = u''
+    if not isinstance(value, unicode):
+        value = str(value).decode('utf-8', 'replace')
+    text = escape(INVALID.sub(u'', value)).encode('utf-8')
+    return '<c r="%s"%s t="inlineStr"><is><t xml:space="preserve">%s</t>'\
+        '</is></c>' % (ref, style, text)
+
+
+class XLSXWriter(object):
+    """Single-sheet XLSX workbook, written one row at a time."""
+
+    def __init__(self, filename, sheet='Sheet1', widths=None):
+        """
+        Args:
+            filename: string
+                name of the workbook file to create
+            sheet: string
+                name of the (only) sheet in the workbook
+            widths: list
+                width, in characters, of each column; None for the default
+        """
+        self.filename = filename
+        self.sheet = sheet
+        self.rows = 0
+        handle, self.tmp_path = tempfile.mkstemp(suffix='.xml')
+        self.tmp_file = os.fdopen(handle, 'wb')
+        self.tmp_file.write(SHEET_START)
+        if widths:
+            self.tmp_file.write('<cols>')
+            for number, width in enumerate(widths):
+                if width:
+                    self.tmp_file.write(
+                        '<col min="%d" max="%d" width="%s" customWidth="1"/>'
+                        % (number + 1, number + 1, width))
+            self.tmp_file.write('</cols>')
+        self.tmp_file.write('<sheetData>')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write_row(self, values, bold=False):
+        """Add a row of cells to the sheet."""
+        if self.rows >= MAX_ROWS:
+            raise ValueError('An XLSX sheet cannot hold more than %d rows' %
+                             MAX_ROWS)
+        self.rows += 1
+        cells = [cell_xml('%s%d' % (column_name(col), self.rows), value, bold)
+                 for col, value in enumerate(values)]
+        self.tmp_file.write('<row r="%d">%s</row>' % (self.rows, ''.join(cells)))
+
+    def close(self):
+        """Finish the sheet and save the workbook."""
+        self.tmp_file.write(SHEET_END)
+        self.tmp_file.close()
+        try:
+            with zipfile.ZipFile(self.filename, 'w',
+                                 zipfile.ZIP_DEFLATED) as book:
+                book.writestr('[Content_Types].xml', CONTENT_TYPES)
+                book.writestr('_rels/.rels', ROOT_RELS)
+                book.writestr('xl/workbook.xml', WORKBOOK % escape(
+                    self.sheet, {'"': '&quot;'}))
+                book.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+                book.writestr('xl/styles.xml', STYLES)
+                book.write(self.tmp_path, 'xl/worksheets/sheet1.xml')
+        finally:
+            os.remove(self.tmp_path)
+
+    def discard(self):
+        """Abandon the workbook, e.g. after an error."""
+        self.tmp_file.close()
+        os.remove(self.tmp_path)